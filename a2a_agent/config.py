@@ -0,0 +1,50 @@
+"""
+Process-wide settings for the A2A agent and its external agents.
+
+Environment variables (and .env) are read once, on the first get_config() call.
+"""
+
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional
+from dotenv import load_dotenv
+
+
+@dataclass(frozen=True, slots=True)
+class Config:
+    # MCP server
+    mcp_base: str
+    # Redis (task store, queue and caches)
+    redis_url: str
+    # SMTP / email
+    smtp_server: Optional[str]
+    smtp_port: int
+    smtp_username: Optional[str]
+    smtp_password: Optional[str]
+    email_sender: Optional[str]
+    # OpenAI
+    openai_api_key: Optional[str]
+    openai_api_url: str
+    summary_cache_ttl: int
+    # GitHub
+    github_token: Optional[str]
+
+
+@lru_cache(maxsize=1)
+def get_config() -> Config:
+    load_dotenv()
+    env = os.environ
+    return Config(
+        mcp_base=env.get("MCP_BASE", "http://localhost:8001"),
+        redis_url=env.get("REDIS_URL", "redis://localhost:6379/0"),
+        smtp_server=env.get("SMTP_SERVER"),
+        smtp_port=int(env.get("SMTP_PORT", "587")),
+        smtp_username=env.get("SMTP_USERNAME"),
+        smtp_password=env.get("SMTP_PASSWORD"),
+        email_sender=env.get("EMAIL_SENDER"),
+        openai_api_key=env.get("OPENAI_API_KEY"),
+        openai_api_url=env.get("OPENAI_API_URL", "https://api.openai.com/v1/chat/completions"),
+        summary_cache_ttl=int(env.get("SUMMARY_CACHE_TTL", "86400")),
+        github_token=env.get("GITHUB_TOKEN"),
+    )
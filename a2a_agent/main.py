@@ -1,15 +1,16 @@
 import logging
 from fastapi import FastAPI
-from .tasks import router
+from .tasks import router, _client, _redis
 import os
-from fastapi.responses import FileResponse
+from fastapi.responses import ORJSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+from external_agents import emailer, github_agent, summarizer
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("a2a_agent")
 
-app = FastAPI(title="A2A Agent Example")
+app = FastAPI(title="A2A Agent Example", default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -23,15 +24,27 @@ app.add_middleware(
 def startup_event():
     logger.info("A2A Agent is starting up...")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    logger.info("A2A Agent is shutting down, closing MCP, Redis, SMTP and GitHub clients...")
+    await _client.aclose()
+    await _redis.aclose()
+    await emailer.close_smtp()
+    await summarizer.close_clients()
+    await github_agent.close_client()
+
 # Mount the tasks router
 logger.info("Mounting tasks router.")
 app.include_router(router)
 
-# Serve agent_card.json for discovery
+# Serve agent_card.json for discovery; the file is static, so read it once at import
+with open(os.path.join(os.path.dirname(__file__), "agent_card.json"), "rb") as f:
+    AGENT_CARD_BYTES = f.read()
+
 @app.get("/.well-known/agent.json")
 def agent_card():
     logger.info("Serving agent_card.json for discovery.")
-    return FileResponse(os.path.join(os.path.dirname(__file__), "agent_card.json"), media_type="application/json")
+    return Response(content=AGENT_CARD_BYTES, media_type="application/json")
 
 # Import tasks to register endpoints
 from . import tasks  # noqa 
\ No newline at end of file
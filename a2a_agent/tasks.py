@@ -4,60 +4,137 @@ import os
 import logging
 import uuid
 import asyncio
-from typing import Dict, Any
+from typing import Dict, Any, List
 from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import Response
 import httpx
+import msgpack
+import orjson
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
 from external_agents import github_agent, summarizer, emailer
+from .config import get_config
 
 logger = logging.getLogger("a2a_agent.tasks")
 
 router = APIRouter()
 
-# In-memory task store for async mode
-task_store: Dict[str, Dict[str, Any]] = {}
+# Redis-backed task store for async mode, shared by all A2A workers.
+# Each task is a hash "task:{task_id}" with msgpack-encoded status/result/input fields.
+TASK_TTL_SECONDS = int(os.environ.get("A2A_TASK_TTL", "3600"))
+ACTIVE_TASKS_KEY = "a2a:tasks"
+
+# Async-mode submissions are queued on a Redis list and consumed by a2a_agent.worker processes
+TASK_QUEUE_KEY = "a2a:queue"
+TASK_QUEUE_MAX = int(os.environ.get("A2A_QUEUE_MAX", "1000"))
+
+_redis = aioredis.from_url(get_config().redis_url, decode_responses=False)
+
+def _task_key(task_id: str) -> str:
+    return f"task:{task_id}"
+
+async def save_task(task_id: str, **fields: Any):
+    """Write task fields to its Redis hash and refresh the expiry."""
+    key = _task_key(task_id)
+    mapping = {name: msgpack.packb(value, use_bin_type=True) for name, value in fields.items()}
+    async with _redis.pipeline(transaction=True) as pipe:
+        pipe.hset(key, mapping=mapping)
+        pipe.expire(key, TASK_TTL_SECONDS)
+        await pipe.execute()
+
+async def load_task(task_id: str) -> Dict[str, Any]:
+    """Read a task hash from Redis. Returns an empty dict if the task is unknown or expired."""
+    raw = await _redis.hgetall(_task_key(task_id))
+    return {name.decode(): msgpack.unpackb(value, raw=False) for name, value in raw.items()}
 
 # MCP server base URL
-MCP_BASE = os.environ.get("MCP_BASE", "http://localhost:8001")
+MCP_BASE = get_config().mcp_base
+
+# Shared HTTP client so connections to the MCP server are pooled across tasks.
+# The transport retries failed connection attempts and multiplexes requests over HTTP/2.
+_transport = httpx.AsyncHTTPTransport(
+    retries=3,
+    http2=True,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+)
+_client = httpx.AsyncClient(
+    base_url=MCP_BASE,
+    transport=_transport,
+    headers={"Accept": "application/x-msgpack"},
+    timeout=httpx.Timeout(connect=2.0, read=15.0, write=5.0, pool=1.0),
+)
+
+# Max PDFs summarized concurrently, to stay within OpenAI rate limits
+PDF_SUMMARY_CONCURRENCY = int(os.environ.get("A2A_PDF_CONCURRENCY", "8"))
+
+# Caps on concurrently running tasks in this process and on how long a single task may run
+MAX_INFLIGHT_TASKS = int(os.environ.get("A2A_MAX_INFLIGHT", "32"))
+TASK_TIMEOUT_SECONDS = float(os.environ.get("A2A_TASK_TIMEOUT", "60"))
+
+_inflight = asyncio.Semaphore(MAX_INFLIGHT_TASKS)
+
+async def run_bounded(data: dict):
+    """Run process_task under the in-flight semaphore and the per-task timeout."""
+    async with _inflight:
+        return await asyncio.wait_for(process_task(data), timeout=TASK_TIMEOUT_SECONDS)
 
 # Check async mode from env
 ASYNC_MODE = os.environ.get("A2A_ASYNC_MODE", "false").lower() == "true"
 
 @router.post("/tasks/submit")
 async def submit_task(request: Request):
-    """Accept a task request. If async mode, return task_id and process in background. Else, process synchronously."""
+    """Accept a task request. If async mode, queue it for a worker and return task_id. Else, process synchronously."""
     data = await request.json()
     logger.info(f"Received task submission: {data}")
     if ASYNC_MODE:
+        if await _redis.llen(TASK_QUEUE_KEY) >= TASK_QUEUE_MAX:
+            logger.warning("Task queue is full, rejecting submission.")
+            raise HTTPException(status_code=503, detail="Task queue is full, try again later")
         task_id = str(uuid.uuid4())
-        task_store[task_id] = {"status": "submitted", "result": None, "input": data}
-        asyncio.create_task(process_task_async(task_id, data))
-        logger.info(f"Task {task_id} submitted for async processing.")
+        await save_task(task_id, status="submitted", result=None, input=data)
+        await _redis.sadd(ACTIVE_TASKS_KEY, task_id)
+        await _redis.lpush(TASK_QUEUE_KEY, msgpack.packb({"task_id": task_id, "data": data}, use_bin_type=True))
+        logger.info(f"Task {task_id} queued for async processing.")
         return {"task_id": task_id, "status": "submitted"}
     else:
         logger.info("Processing task synchronously.")
-        result = await process_task(data)
+        try:
+            result = await run_bounded(data)
+        except asyncio.TimeoutError:
+            logger.error(f"Task timed out after {TASK_TIMEOUT_SECONDS}s.")
+            raise HTTPException(status_code=504, detail="Task timed out")
+        if isinstance(result, RawJSON):
+            # Splice the upstream JSON into the envelope instead of parsing and re-serializing it
+            return Response(content=b'{"status":"completed","result":' + result + b"}", media_type="application/json")
         return {"status": "completed", "result": result}
 
 @router.get("/tasks/{task_id}")
 async def get_task_status(task_id: str):
     """Get the status/result of an async task."""
-    if task_id not in task_store:
+    task = await load_task(task_id)
+    if not task:
         logger.warning(f"Task {task_id} not found.")
         raise HTTPException(status_code=404, detail="Task not found")
-    return task_store[task_id]
+    return task
 
 async def process_task_async(task_id: str, data: dict):
     logger.info(f"Async processing for task {task_id} started.")
-    task_store[task_id]["status"] = "working"
     try:
-        result = await process_task(data)
-        task_store[task_id]["result"] = result
-        task_store[task_id]["status"] = "completed"
+        await save_task(task_id, status="working")
+        result = await run_bounded(data)
+        if isinstance(result, RawJSON):
+            # orjson only accepts exact bytes, not subclasses
+            result = orjson.loads(bytes(result))
+        await save_task(task_id, status="completed", result=result)
         logger.info(f"Task {task_id} completed.")
+    except asyncio.TimeoutError:
+        logger.error(f"Task {task_id} timed out after {TASK_TIMEOUT_SECONDS}s.")
+        await save_task(task_id, status="failed", result=f"Task timed out after {TASK_TIMEOUT_SECONDS}s")
     except Exception as e:
         logger.error(f"Task {task_id} failed: {e}")
-        task_store[task_id]["result"] = str(e)
-        task_store[task_id]["status"] = "failed"
+        await save_task(task_id, status="failed", result=str(e))
+    finally:
+        await _redis.srem(ACTIVE_TASKS_KEY, task_id)
 
 def parse_task(data: dict):
     """Parse the task input and determine what actions to take."""
@@ -66,65 +143,145 @@ def parse_task(data: dict):
     # Or: {"action": "weather_forecast", "lat": 37.77, "lon": -122.41}
     return data.get("action"), data
 
+# MCP server endpoint paths, relative to the shared client's base_url
+FILES_SEARCH_PATH = "/files/search"
+WEATHER_ALERTS_PATH = "/weather/alerts"
+WEATHER_FORECAST_PATH = "/weather/forecast"
+
+# File listings are cached briefly so repeated combo/summarize runs skip the MCP round-trip
+FILES_CACHE_TTL_SECONDS = int(os.environ.get("A2A_FILES_CACHE_TTL", "30"))
+
+# Intra-service payloads are msgpack; passthrough actions ask for JSON so the bytes can go straight to the caller
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+ACCEPT_JSON = {"Accept": "application/json"}
+
+class RawJSON(bytes):
+    """JSON body from the MCP server that is passed through to the caller without being parsed."""
+
+def _decode(resp: httpx.Response) -> Any:
+    """Decode an MCP response body, msgpack or JSON depending on what the server sent."""
+    if resp.headers.get("content-type", "").startswith(MSGPACK_MEDIA_TYPE):
+        return msgpack.unpackb(resp.content, raw=False)
+    return orjson.loads(resp.content)
+
+async def _cached_files_search(client: httpx.AsyncClient, directory: str, pattern: str) -> List[str]:
+    """Return the file listing, caching its msgpack encoding."""
+    key = f"files:{directory}:{pattern}"
+    try:
+        cached = await _redis.get(key)
+        if cached is not None:
+            return msgpack.unpackb(cached, raw=False)
+    except RedisError as e:
+        logger.warning(f"Files cache lookup failed: {e}")
+    resp = await client.get(FILES_SEARCH_PATH, params={"directory": directory, "pattern": pattern})
+    resp.raise_for_status()
+    files = _decode(resp)
+    packed = resp.content if resp.headers.get("content-type", "").startswith(MSGPACK_MEDIA_TYPE) else msgpack.packb(files, use_bin_type=True)
+    try:
+        await _redis.setex(key, FILES_CACHE_TTL_SECONDS, packed)
+    except RedisError as e:
+        logger.warning(f"Files cache store failed: {e}")
+    return files
+
+async def _file_search(client: httpx.AsyncClient, params: dict):
+    directory, pattern = params["directory"], params.get("pattern", "")
+    # Cached as the raw JSON body, under its own key, so hits pass straight through too
+    key = f"files_json:{directory}:{pattern}"
+    try:
+        cached = await _redis.get(key)
+        if cached is not None:
+            return RawJSON(cached)
+    except RedisError as e:
+        logger.warning(f"Files cache lookup failed: {e}")
+    resp = await client.get(FILES_SEARCH_PATH, params={"directory": directory, "pattern": pattern}, headers=ACCEPT_JSON)
+    resp.raise_for_status()
+    try:
+        await _redis.setex(key, FILES_CACHE_TTL_SECONDS, resp.content)
+    except RedisError as e:
+        logger.warning(f"Files cache store failed: {e}")
+    return RawJSON(resp.content)
+
+async def _weather_alerts(client: httpx.AsyncClient, params: dict):
+    resp = await client.get(WEATHER_ALERTS_PATH, params={"state": params["state"]})
+    resp.raise_for_status()
+    return _decode(resp)
+
+async def _weather_forecast(client: httpx.AsyncClient, params: dict):
+    resp = await client.get(WEATHER_FORECAST_PATH, params={"lat": params["lat"], "lon": params["lon"]}, headers=ACCEPT_JSON)
+    resp.raise_for_status()
+    return RawJSON(resp.content)
+
+async def _combo(client: httpx.AsyncClient, params: dict):
+    # Example: combo action: search files, then get weather for each file's date/location (simplified)
+    has_coords = "lat" in params and "lon" in params
+    coros = [_cached_files_search(client, params["directory"], params.get("pattern", ""))]
+    if has_coords:
+        coros.append(client.get(WEATHER_FORECAST_PATH, params={"lat": params["lat"], "lon": params["lon"]}))
+    # Issue every needed call up front; a forecast failure only matters if the forecast is used
+    files, *rest = await asyncio.gather(*coros, return_exceptions=True)
+    if isinstance(files, BaseException):
+        raise files
+    # For demo, just get weather for the first file if lat/lon provided
+    if files and rest:
+        weather_resp = rest[0]
+        if isinstance(weather_resp, BaseException):
+            raise weather_resp
+        weather_resp.raise_for_status()
+        weather = _decode(weather_resp)
+        return {"files": files, "weather": weather}
+    return {"files": files}
+
+async def _github_issues(client: httpx.AsyncClient, params: dict):
+    # params: {"action": "github_issues", "repo": "owner/repo", "state": "open"}
+    logger.info(f"Fetching GitHub issues for repo: {params.get('repo')}")
+    return await github_agent.fetch_issues(params["repo"], params.get("state", "open"))
+
+async def _github_prs(client: httpx.AsyncClient, params: dict):
+    # params: {"action": "github_prs", "repo": "owner/repo", "state": "open"}
+    logger.info(f"Fetching GitHub PRs for repo: {params.get('repo')}")
+    return await github_agent.fetch_pull_requests(params["repo"], params.get("state", "open"))
+
+async def _summarize_and_email_pdfs(client: httpx.AsyncClient, params: dict):
+    # params: {"action": "summarize_and_email_pdfs", "directory": "/path", "email": "user@example.com"}
+    directory = params["directory"]
+    recipient = params["email"]
+    logger.info(f"Searching for PDF files in {directory}")
+    pdf_files = await _cached_files_search(client, directory, ".pdf")
+    if not pdf_files:
+        logger.warning("No PDF files found.")
+        return {"status": "no_pdfs_found", "files": [], "summaries": [], "email_sent": False}
+    sem = asyncio.Semaphore(PDF_SUMMARY_CONCURRENCY)
+
+    async def summarize_one(pdf: str) -> Dict[str, str]:
+        async with sem:
+            logger.info(f"Summarizing PDF: {pdf}")
+            summary = await summarizer.summarize_pdf(pdf)
+            return {"file": pdf, "summary": summary}
+
+    # Summarize all PDFs concurrently; gather keeps results in pdf_files order
+    summaries = await asyncio.gather(*(summarize_one(pdf) for pdf in pdf_files))
+    email_body = "PDF Summaries:\n\n" + "\n\n".join(f"{os.path.basename(s['file'])}:\n{s['summary']}" for s in summaries)
+    subject = f"PDF Summaries for {directory}"
+    email_sent = await emailer.send_email(recipient, subject, email_body)
+    logger.info(f"Email sent: {email_sent}")
+    return {"status": "completed", "files": pdf_files, "summaries": summaries, "email_sent": email_sent}
+
+# Action name -> handler coroutine, built once at import
+_HANDLERS = {
+    "file_search": _file_search,
+    "weather_alerts": _weather_alerts,
+    "weather_forecast": _weather_forecast,
+    "combo": _combo,
+    "github_issues": _github_issues,
+    "github_prs": _github_prs,
+    "summarize_and_email_pdfs": _summarize_and_email_pdfs,
+}
+
 async def process_task(data: dict):
     action, params = parse_task(data)
     logger.info(f"Processing action: {action} with params: {params}")
-    async with httpx.AsyncClient() as client:
-        if action == "file_search":
-            resp = await client.get(f"{MCP_BASE}/files/search", params={"directory": params["directory"], "pattern": params.get("pattern", "")})
-            resp.raise_for_status()
-            return resp.json()
-        elif action == "weather_alerts":
-            resp = await client.get(f"{MCP_BASE}/weather/alerts", params={"state": params["state"]})
-            resp.raise_for_status()
-            return resp.text
-        elif action == "weather_forecast":
-            resp = await client.get(f"{MCP_BASE}/weather/forecast", params={"lat": params["lat"], "lon": params["lon"]})
-            resp.raise_for_status()
-            return resp.json()
-        elif action == "combo":
-            # Example: combo action: search files, then get weather for each file's date/location (simplified)
-            files_resp = await client.get(f"{MCP_BASE}/files/search", params={"directory": params["directory"], "pattern": params.get("pattern", "")})
-            files_resp.raise_for_status()
-            files = files_resp.json()
-            # For demo, just get weather for the first file if lat/lon provided
-            if files and "lat" in params and "lon" in params:
-                weather_resp = await client.get(f"{MCP_BASE}/weather/forecast", params={"lat": params["lat"], "lon": params["lon"]})
-                weather_resp.raise_for_status()
-                weather = weather_resp.json()
-                return {"files": files, "weather": weather}
-            return {"files": files}
-        elif action == "github_issues":
-            # params: {"action": "github_issues", "repo": "owner/repo", "state": "open"}
-            logger.info(f"Fetching GitHub issues for repo: {params.get('repo')}")
-            issues = github_agent.fetch_issues(params["repo"], params.get("state", "open"))
-            return issues
-        elif action == "github_prs":
-            # params: {"action": "github_prs", "repo": "owner/repo", "state": "open"}
-            logger.info(f"Fetching GitHub PRs for repo: {params.get('repo')}")
-            prs = github_agent.fetch_pull_requests(params["repo"], params.get("state", "open"))
-            return prs
-        elif action == "summarize_and_email_pdfs":
-            # params: {"action": "summarize_and_email_pdfs", "directory": "/path", "recipient": "user@example.com"}
-            directory = params["directory"]
-            recipient = params["email"]
-            logger.info(f"Searching for PDF files in {directory}")
-            files_resp = await client.get(f"{MCP_BASE}/files/search", params={"directory": directory, "pattern": ".pdf"})
-            files_resp.raise_for_status()
-            pdf_files = files_resp.json()
-            if not pdf_files:
-                logger.warning("No PDF files found.")
-                return {"status": "no_pdfs_found", "files": [], "summaries": [], "email_sent": False}
-            summaries = []
-            for pdf in pdf_files:
-                logger.info(f"Summarizing PDF: {pdf}")
-                summary = summarizer.summarize_pdf(pdf)
-                summaries.append({"file": pdf, "summary": summary})
-            email_body = "PDF Summaries:\n\n" + "\n\n".join(f"{os.path.basename(s['file'])}:\n{s['summary']}" for s in summaries)
-            subject = f"PDF Summaries for {directory}"
-            email_sent = emailer.send_email(recipient, subject, email_body)
-            logger.info(f"Email sent: {email_sent}")
-            return {"status": "completed", "files": pdf_files, "summaries": summaries, "email_sent": email_sent}
-        else:
-            logger.warning(f"Unknown action: {action}")
-            return {"error": f"Unknown action: {action}"} 
\ No newline at end of file
+    handler = _HANDLERS.get(action)
+    if handler is None:
+        logger.warning(f"Unknown action: {action}")
+        return {"error": f"Unknown action: {action}"}
+    return await handler(_client, params)
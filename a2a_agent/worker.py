@@ -0,0 +1,67 @@
+"""
+Worker process for async-mode A2A tasks.
+
+Consumes task envelopes pushed onto the Redis queue by /tasks/submit and runs them,
+writing status and results back to the task hashes. Run one or more with:
+
+    python -m a2a_agent.worker
+"""
+
+import os
+import logging
+import asyncio
+import anyio
+import msgpack
+from .tasks import _client, _redis, TASK_QUEUE_KEY, process_task_async
+from external_agents import emailer, github_agent, summarizer
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("a2a_agent.worker")
+
+# Number of tasks a single worker process runs at once
+WORKER_CONCURRENCY = int(os.environ.get("A2A_WORKER_CONCURRENCY", "4"))
+
+async def consume(worker_id: int):
+    logger.info(f"Consumer {worker_id} waiting for tasks on '{TASK_QUEUE_KEY}'")
+    while True:
+        try:
+            _, payload = await _redis.brpop(TASK_QUEUE_KEY, timeout=0)
+        except Exception as e:
+            logger.error(f"Consumer {worker_id} could not read from '{TASK_QUEUE_KEY}': {e}")
+            await anyio.sleep(1)
+            continue
+        # A bad envelope or a Redis error while recording status must not take down the other consumers
+        try:
+            job = msgpack.unpackb(payload, raw=False)
+            logger.info(f"Consumer {worker_id} picked up task {job['task_id']}")
+            await process_task_async(job["task_id"], job["data"])
+        except Exception as e:
+            logger.error(f"Consumer {worker_id} failed to process job: {e}")
+
+async def run_worker():
+    try:
+        # Consumers share one task group so a failure or shutdown cancels all of them cleanly
+        async with anyio.create_task_group() as tg:
+            for i in range(WORKER_CONCURRENCY):
+                tg.start_soon(consume, i)
+    finally:
+        await _client.aclose()
+        await _redis.aclose()
+        await emailer.close_smtp()
+        await summarizer.close_clients()
+        await github_agent.close_client()
+
+if __name__ == "__main__":
+    # Prefer the libuv-backed event loop; fall back to stock asyncio where uvloop is unavailable (e.g. Windows).
+    # The API server gets uvloop from uvicorn's --loop uvloop instead (see run_all.sh).
+    try:
+        import uvloop
+        run = uvloop.run
+        logger.info("Using uvloop event loop.")
+    except ImportError:
+        run = asyncio.run
+        logger.info("uvloop not available, using default asyncio event loop.")
+    try:
+        run(run_worker())
+    except KeyboardInterrupt:
+        logger.info("Worker stopped.")
@@ -1,36 +1,63 @@
-import os
 import logging
-import smtplib
+import asyncio
+from typing import Optional
 from email.message import EmailMessage
-from dotenv import load_dotenv
-
-# Load environment variables from .env file
-load_dotenv()
+import aiosmtplib
+from a2a_agent.config import get_config
 
 logger = logging.getLogger("external_agents.emailer")
 
-SMTP_SERVER = os.environ.get("SMTP_SERVER")
-SMTP_PORT = int(os.environ.get("SMTP_PORT", "587"))
-SMTP_USERNAME = os.environ.get("SMTP_USERNAME")
-SMTP_PASSWORD = os.environ.get("SMTP_PASSWORD")
-EMAIL_SENDER = os.environ.get("EMAIL_SENDER")
+
+# Authenticated SMTP connection reused across sends; the lock serializes access to it
+_smtp: Optional[aiosmtplib.SMTP] = None
+_smtp_lock = asyncio.Lock()
+
+
+async def _get_smtp() -> aiosmtplib.SMTP:
+    """Return the shared SMTP connection, connecting and logging in on first use or after a drop."""
+    global _smtp
+    if _smtp is None or not _smtp.is_connected:
+        config = get_config()
+        logger.info(f"Connecting to SMTP server {config.smtp_server}:{config.smtp_port}")
+        smtp = aiosmtplib.SMTP(hostname=config.smtp_server, port=config.smtp_port, start_tls=False)
+        await smtp.connect()
+        await smtp.starttls()
+        await smtp.login(config.smtp_username, config.smtp_password)
+        _smtp = smtp
+    return _smtp
+
+
+async def close_smtp():
+    """Close the shared SMTP connection if one is open."""
+    global _smtp
+    if _smtp is not None and _smtp.is_connected:
+        try:
+            await _smtp.quit()
+        except aiosmtplib.SMTPException as e:
+            logger.warning(f"Error closing SMTP connection: {e}")
+    _smtp = None
 
 
-def send_email(recipient: str, subject: str, body: str) -> bool:
+async def send_email(recipient: str, subject: str, body: str) -> bool:
     logger.info(f"Sending email to {recipient}")
     msg = EmailMessage()
-    msg["From"] = EMAIL_SENDER
+    msg["From"] = get_config().email_sender
     msg["To"] = recipient
     msg["Subject"] = subject
     msg.set_content(body)
+    global _smtp
     try:
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as server:
-            server.ehlo()
-            server.starttls()
-            server.login(SMTP_USERNAME, SMTP_PASSWORD)
-            server.send_message(msg)
+        async with _smtp_lock:
+            try:
+                smtp = await _get_smtp()
+                await smtp.send_message(msg)
+            except aiosmtplib.SMTPServerDisconnected:
+                logger.warning("SMTP connection was dropped, reconnecting.")
+                _smtp = None
+                smtp = await _get_smtp()
+                await smtp.send_message(msg)
         logger.info("Email sent successfully.")
         return True
     except Exception as e:
         logger.error(f"Failed to send email: {e}")
-        return False 
\ No newline at end of file
+        return False
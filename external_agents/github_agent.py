@@ -1,67 +1,155 @@
-# Placeholder for GitHub agent integration 
+# Placeholder for GitHub agent integration
 
-import os
 import logging
+import asyncio
+from functools import lru_cache
+import httpx
 from github import Github, GithubException
-from typing import List, Dict, Any
+from gidgethub import GitHubException as GidgetHubException
+from gidgethub.httpx import GitHubAPI
+from typing import List, Dict, Any, Optional
+from a2a_agent.config import get_config
 
 logger = logging.getLogger("external_agents.github_agent")
 
-def get_github_client():
-    token = os.environ.get("GITHUB_TOKEN")
+GITHUB_REQUESTER = "mcp-a2a-github-agent"
+
+# Page size used for both the GraphQL and REST paths (GitHub's maximum)
+PAGE_SIZE = 100
+
+# Memoized so the client (and its underlying requests.Session) is built once and reused
+@lru_cache(maxsize=1)
+def _github_client(token: Optional[str]) -> Github:
     if token:
         logger.info("Using authenticated GitHub client.")
-        return Github(token)
+        return Github(token, per_page=PAGE_SIZE, retry=3)
     else:
         logger.warning("No GITHUB_TOKEN set, using unauthenticated GitHub client (rate limits apply).")
-        return Github()
+        return Github(per_page=PAGE_SIZE, retry=3)
+
+def get_github_client() -> Github:
+    return _github_client(get_config().github_token)
+
+# Async HTTP/2 client for the GraphQL API, pooled across calls
+_http = httpx.AsyncClient(http2=True, timeout=30.0)
+
+def get_graphql_client() -> GitHubAPI:
+    return GitHubAPI(_http, GITHUB_REQUESTER, oauth_token=get_config().github_token)
+
+async def close_client():
+    await _http.aclose()
+
+# GraphQL queries select only the fields we return, 100 nodes per request
+ISSUES_QUERY = """
+query($owner: String!, $name: String!, $states: [IssueState!], $first: Int!, $after: String) {
+  repository(owner: $owner, name: $name) {
+    items: issues(states: $states, first: $first, after: $after) {
+      pageInfo { hasNextPage endCursor }
+      nodes { databaseId number title state url author { login } }
+    }
+  }
+}
+"""
+
+PULL_REQUESTS_QUERY = """
+query($owner: String!, $name: String!, $states: [PullRequestState!], $first: Int!, $after: String) {
+  repository(owner: $owner, name: $name) {
+    items: pullRequests(states: $states, first: $first, after: $after) {
+      pageInfo { hasNextPage endCursor }
+      nodes { databaseId number title state url author { login } }
+    }
+  }
+}
+"""
+
+# REST-style state names mapped to GraphQL enum filters (None means no filter)
+ISSUE_STATES = {"open": ["OPEN"], "closed": ["CLOSED"], "all": None}
+PULL_REQUEST_STATES = {"open": ["OPEN"], "closed": ["CLOSED", "MERGED"], "all": None}
 
-def fetch_issues(repo_full_name: str, state: str = "open") -> List[Dict[str, Any]]:
+def _node_to_dict(node: Dict[str, Any]) -> Dict[str, Any]:
+    # GraphQL reports MERGED for merged PRs; REST reports those as closed
+    state = node["state"].lower()
+    return {
+        "id": node["databaseId"],
+        "number": node["number"],
+        "title": node["title"],
+        "user": node["author"]["login"] if node.get("author") else None,
+        "state": "closed" if state == "merged" else state,
+        "url": node["url"],
+    }
+
+async def _graphql_fetch_all(query: str, repo_full_name: str, states: Optional[List[str]]) -> List[Dict[str, Any]]:
+    """Walk a cursor-paginated repository connection, PAGE_SIZE nodes per round-trip."""
+    owner, name = repo_full_name.split("/", 1)
+    gh = get_graphql_client()
+    results = []
+    cursor = None
+    while True:
+        data = await gh.graphql(query, owner=owner, name=name, states=states, first=PAGE_SIZE, after=cursor)
+        connection = data["repository"]["items"]
+        results.extend(_node_to_dict(node) for node in connection["nodes"])
+        if not connection["pageInfo"]["hasNextPage"]:
+            return results
+        cursor = connection["pageInfo"]["endCursor"]
+
+def _fetch_issues_rest(repo_full_name: str, state: str = "open") -> List[Dict[str, Any]]:
+    gh = get_github_client()
+    repo = gh.get_repo(repo_full_name)
+    issues = repo.get_issues(state=state)
+    return [
+        {
+            "id": issue.id,
+            "number": issue.number,
+            "title": issue.title,
+            "user": issue.user.login,
+            "state": issue.state,
+            "url": issue.html_url,
+        }
+        for issue in issues if not issue.pull_request
+    ]
+
+def _fetch_pull_requests_rest(repo_full_name: str, state: str = "open") -> List[Dict[str, Any]]:
+    gh = get_github_client()
+    repo = gh.get_repo(repo_full_name)
+    prs = repo.get_pulls(state=state)
+    return [
+        {
+            "id": pr.id,
+            "number": pr.number,
+            "title": pr.title,
+            "user": pr.user.login,
+            "state": pr.state,
+            "url": pr.html_url,
+        }
+        for pr in prs
+    ]
+
+async def fetch_issues(repo_full_name: str, state: str = "open") -> List[Dict[str, Any]]:
     """Fetch issues from a GitHub repository. Returns a list or an error dict."""
     logger.info(f"Fetching {state} issues for repo: {repo_full_name}")
-    gh = get_github_client()
     try:
-        repo = gh.get_repo(repo_full_name)
-        issues = repo.get_issues(state=state)
-        return [
-            {
-                "id": issue.id,
-                "number": issue.number,
-                "title": issue.title,
-                "user": issue.user.login,
-                "state": issue.state,
-                "url": issue.html_url,
-            }
-            for issue in issues if not issue.pull_request
-        ]
-    except GithubException as e:
+        if get_config().github_token:
+            return await _graphql_fetch_all(ISSUES_QUERY, repo_full_name, ISSUE_STATES.get(state, ["OPEN"]))
+        # GraphQL requires authentication; fall back to REST off the event loop
+        return await asyncio.to_thread(_fetch_issues_rest, repo_full_name, state)
+    except (GithubException, GidgetHubException) as e:
         logger.error(f"GitHub API error: {e.data if hasattr(e, 'data') else str(e)}")
         return [{"error": f"GitHub API error: {e.data if hasattr(e, 'data') else str(e)}"}]
     except Exception as e:
         logger.error(f"Unexpected error: {str(e)}")
         return [{"error": f"Unexpected error: {str(e)}"}]
 
-def fetch_pull_requests(repo_full_name: str, state: str = "open") -> List[Dict[str, Any]]:
+async def fetch_pull_requests(repo_full_name: str, state: str = "open") -> List[Dict[str, Any]]:
     """Fetch pull requests from a GitHub repository. Returns a list or an error dict."""
     logger.info(f"Fetching {state} pull requests for repo: {repo_full_name}")
-    gh = get_github_client()
     try:
-        repo = gh.get_repo(repo_full_name)
-        prs = repo.get_pulls(state=state)
-        return [
-            {
-                "id": pr.id,
-                "number": pr.number,
-                "title": pr.title,
-                "user": pr.user.login,
-                "state": pr.state,
-                "url": pr.html_url,
-            }
-            for pr in prs
-        ]
-    except GithubException as e:
+        if get_config().github_token:
+            return await _graphql_fetch_all(PULL_REQUESTS_QUERY, repo_full_name, PULL_REQUEST_STATES.get(state, ["OPEN"]))
+        # GraphQL requires authentication; fall back to REST off the event loop
+        return await asyncio.to_thread(_fetch_pull_requests_rest, repo_full_name, state)
+    except (GithubException, GidgetHubException) as e:
         logger.error(f"GitHub API error: {e.data if hasattr(e, 'data') else str(e)}")
         return [{"error": f"GitHub API error: {e.data if hasattr(e, 'data') else str(e)}"}]
     except Exception as e:
         logger.error(f"Unexpected error: {str(e)}")
-        return [{"error": f"Unexpected error: {str(e)}"}] 
\ No newline at end of file
+        return [{"error": f"Unexpected error: {str(e)}"}]
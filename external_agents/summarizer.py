@@ -1,66 +1,148 @@
-import os
 import logging
+import asyncio
+import hashlib
+from functools import lru_cache
 from typing import Optional
-import PyPDF2
-import requests
-from dotenv import load_dotenv
-
-load_dotenv()
+import fitz  # PyMuPDF
+import httpx
+import orjson
+import tiktoken
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+from a2a_agent.config import get_config
 
 logger = logging.getLogger("external_agents.summarizer")
 
-OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
-OPENAI_API_URL = os.environ.get("OPENAI_API_URL", "https://api.openai.com/v1/chat/completions")
+# Summaries are cached in Redis keyed by the SHA-256 of the PDF bytes
+_redis = aioredis.from_url(get_config().redis_url, decode_responses=True)
+
+# Shared HTTP/2 client so concurrent summaries multiplex over one connection to the OpenAI API
+_http = httpx.AsyncClient(
+    http2=True,
+    timeout=30.0,
+    limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+)
+
+OPENAI_MODEL = "gpt-3.5-turbo"
+
+# Input is truncated by tokens rather than characters, leaving room for the prompt and the 256-token reply
+MAX_INPUT_TOKENS = 3500
+# Extraction stops after this many characters; generous versus ~4 chars/token so token truncation decides
+MAX_INPUT_CHARS = MAX_INPUT_TOKENS * 6
+
+_SYSTEM_MESSAGE = {"role": "system", "content": "Summarize the following text."}
 
 
-def extract_text_from_pdf(pdf_path: str) -> str:
+def extract_text_from_pdf(pdf_path: str, max_chars: Optional[int] = MAX_INPUT_CHARS) -> str:
     logger.info(f"Extracting text from PDF: {pdf_path}")
     try:
-        with open(pdf_path, "rb") as f:
-            reader = PyPDF2.PdfReader(f)
-            text = "\n".join(page.extract_text() or "" for page in reader.pages)
-        return text
+        parts = []
+        total = 0
+        with fitz.open(pdf_path) as doc:
+            for page in doc:
+                page_text = page.get_text("text")
+                parts.append(page_text)
+                total += len(page_text)
+                if max_chars is not None and total >= max_chars:
+                    break
+        return "\n".join(parts)
     except Exception as e:
         logger.error(f"Failed to extract text from {pdf_path}: {e}")
         return ""
 
+# Loaded on first use: tiktoken downloads the BPE file the first time, which must not block or break startup
+@lru_cache(maxsize=1)
+def _get_encoding() -> Optional["tiktoken.Encoding"]:
+    try:
+        return tiktoken.encoding_for_model(OPENAI_MODEL)
+    except Exception as e:
+        logger.warning(f"Could not load tiktoken encoding for {OPENAI_MODEL}, truncating by characters: {e}")
+        return None
+
+def truncate_to_tokens(text: str, max_tokens: int = MAX_INPUT_TOKENS) -> str:
+    encoding = _get_encoding()
+    if encoding is None:
+        # Rough fallback at ~4 characters per token
+        return text[:max_tokens * 4]
+    tokens = encoding.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
 def simple_summarize(text: str, max_sentences: int = 3) -> str:
     logger.info("Using simple summarizer.")
     sentences = text.split(".")
     summary = ".".join(sentences[:max_sentences])
     return summary.strip()
 
-def openai_summarize(text: str) -> Optional[str]:
-    if not OPENAI_API_KEY:
+async def openai_summarize(text: str) -> Optional[str]:
+    config = get_config()
+    if not config.openai_api_key:
         logger.warning("OPENAI_API_KEY not set; cannot use OpenAI summarizer.")
         return None
     logger.info("Using OpenAI API for summarization.")
     headers = {
-        "Authorization": f"Bearer {OPENAI_API_KEY}",
+        "Authorization": f"Bearer {config.openai_api_key}",
         "Content-Type": "application/json"
     }
     data = {
-        "model": "gpt-3.5-turbo",
-        "messages": [
-            {"role": "system", "content": "Summarize the following text."},
-            {"role": "user", "content": text[:4000]}  # Truncate for token limit
-        ],
-        "max_tokens": 256
+        "model": OPENAI_MODEL,
+        "messages": [_SYSTEM_MESSAGE, {"role": "user", "content": truncate_to_tokens(text)}],
+        "max_tokens": 256,
+        "stream": True
     }
     try:
-        resp = requests.post(OPENAI_API_URL, headers=headers, json=data, timeout=30)
-        resp.raise_for_status()
-        result = resp.json()
-        return result["choices"][0]["message"]["content"].strip()
+        # Accumulate streamed deltas so a cancelled task stops reading right away
+        parts = []
+        async with _http.stream("POST", config.openai_api_url, headers=headers, json=data) as resp:
+            resp.raise_for_status()
+            async for line in resp.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                payload = line[len("data: "):]
+                if payload == "[DONE]":
+                    break
+                delta = orjson.loads(payload)["choices"][0]["delta"].get("content")
+                if delta:
+                    parts.append(delta)
+        return "".join(parts).strip() or None
     except Exception as e:
         logger.error(f"OpenAI API summarization failed: {e}")
         return None
 
-def summarize_pdf(pdf_path: str) -> str:
-    text = extract_text_from_pdf(pdf_path)
+def file_sha256(pdf_path: str) -> str:
+    h = hashlib.sha256()
+    with open(pdf_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+async def summarize_pdf(pdf_path: str) -> str:
+    try:
+        cache_key = f"pdf_sum:{await asyncio.to_thread(file_sha256, pdf_path)}"
+    except OSError as e:
+        logger.error(f"Failed to read {pdf_path}: {e}")
+        return "Could not extract text from PDF."
+    try:
+        cached = await _redis.get(cache_key)
+        if cached is not None:
+            logger.info(f"Summary cache hit for {pdf_path}")
+            return cached
+    except RedisError as e:
+        logger.warning(f"Summary cache lookup failed: {e}")
+    text = await asyncio.to_thread(extract_text_from_pdf, pdf_path)
     if not text:
         return "Could not extract text from PDF."
-    summary = openai_summarize(text)
-    if summary:
-        return summary
-    return simple_summarize(text) 
\ No newline at end of file
+    summary = await openai_summarize(text)
+    if not summary:
+        # Fallback summaries are not cached so a later run can still get an OpenAI summary
+        return simple_summarize(text)
+    try:
+        await _redis.set(cache_key, summary, ex=get_config().summary_cache_ttl)
+    except RedisError as e:
+        logger.warning(f"Summary cache store failed: {e}")
+    return summary
+
+async def close_clients():
+    await _http.aclose()
+    await _redis.aclose()
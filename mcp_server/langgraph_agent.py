@@ -3,12 +3,19 @@ Advanced LangGraph agent for learning and demonstration purposes
 This module implements a sophisticated multi-step agent workflow using LangGraph
 """
 
+import re
 import json
 import logging
+import statistics
 import asyncio
 from typing import Dict, Any, List, Optional, TypedDict, Annotated
 from datetime import datetime
+import copy
+import functools
 import operator
+import numpy as np
+from collections import Counter, OrderedDict
+from types import MappingProxyType
 
 # LangGraph and LangChain imports
 from langchain.schema import BaseMessage, HumanMessage, AIMessage, SystemMessage
@@ -32,6 +39,87 @@ class AgentState(TypedDict):
     confidence_score: float
     next_action: Optional[str]
 
+# Word lists and punctuation table for analyze_text_content, built once
+_POSITIVE_WORDS = frozenset({"good", "great", "excellent", "amazing", "wonderful", "fantastic"})
+_NEGATIVE_WORDS = frozenset({"bad", "terrible", "awful", "horrible", "disappointing"})
+_PUNCT_TRANS = str.maketrans("", "", ".,!?;:")
+
+def _tokenize(text: str) -> List[str]:
+    """Lowercased words with punctuation removed, split in a single pass"""
+    return text.lower().translate(_PUNCT_TRANS).split()
+
+def _keyword_pattern(words) -> "re.Pattern[str]":
+    """Match any of the words at the start of a word, in one regex pass."""
+    return re.compile(r"\b(?:" + "|".join(map(re.escape, words)) + ")", re.IGNORECASE)
+
+# Routing buckets in priority order: first match wins
+_ROUTE_PATTERNS = {
+    "analyze_content": _keyword_pattern(["analyze", "analysis", "sentiment", "keywords"]),
+    "search_knowledge": _keyword_pattern(["search", "find", "knowledge", "information"]),
+    "calculate_metrics": _keyword_pattern(["calculate", "metrics", "numbers", "data"]),
+    "process_workflow": _keyword_pattern(["workflow", "process", "step", "procedure"]),
+}
+
+# Knowledge domains in priority order: first match wins
+_DOMAIN_PATTERNS = {
+    "technical": _keyword_pattern(["technical", "code", "programming", "api"]),
+    "business": _keyword_pattern(["business", "strategy", "market"]),
+    "science": _keyword_pattern(["research", "study", "data", "science"]),
+}
+
+# Workflow keyword -> step name
+_WORKFLOW_KEYWORDS = {
+    "data": "data_collection",
+    "collect": "data_collection",
+    "analyze": "analysis",
+    "analysis": "analysis",
+    "insight": "insight_generation",
+    "recommend": "recommendation",
+    "validate": "validation",
+    "implement": "implementation"
+}
+_WORKFLOW_PATTERN = re.compile(r"\b(" + "|".join(map(re.escape, _WORKFLOW_KEYWORDS)) + ")", re.IGNORECASE)
+
+_NUM_RE = re.compile(r"-?\d+(?:\.\d+)?")
+
+# Below this many values NumPy's call overhead outweighs its vectorized reductions
+_NUMPY_MIN_VALUES = 4
+
+# Numba is optional; large inputs use a compiled single-pass kernel when it is installed
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Below this many values the JIT dispatch overhead outweighs the single pass
+_JIT_MIN_VALUES = 256
+
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def _moments(arr):
+        """Sum, min, max, mean and Welford's M2 in one traversal"""
+        total = 0.0
+        minimum = arr[0]
+        maximum = arr[0]
+        mean = 0.0
+        m2 = 0.0
+        for i in range(arr.shape[0]):
+            x = arr[i]
+            total += x
+            if x < minimum:
+                minimum = x
+            if x > maximum:
+                maximum = x
+            delta = x - mean
+            mean += delta / (i + 1)
+            m2 += delta * (x - mean)
+        return total, minimum, maximum, mean, m2
+
+    # Compile at import so the first request doesn't pay for it
+    _moments(np.zeros(4))
+else:
+    _moments = None
+
 # Advanced tools for the agent
 @tool
 def analyze_text_content(text: str, analysis_type: str = "sentiment") -> str:
@@ -46,12 +134,9 @@ def analyze_text_content(text: str, analysis_type: str = "sentiment") -> str:
     
     if analysis_type == "sentiment":
         # Mock sentiment analysis
-        positive_words = ["good", "great", "excellent", "amazing", "wonderful", "fantastic"]
-        negative_words = ["bad", "terrible", "awful", "horrible", "disappointing"]
-        
-        text_lower = text.lower()
-        pos_count = sum(word in text_lower for word in positive_words)
-        neg_count = sum(word in text_lower for word in negative_words)
+        tokens = _tokenize(text)
+        pos_count = sum(1 for t in tokens if t in _POSITIVE_WORDS)
+        neg_count = sum(1 for t in tokens if t in _NEGATIVE_WORDS)
         
         if pos_count > neg_count:
             sentiment = "positive"
@@ -64,14 +149,9 @@ def analyze_text_content(text: str, analysis_type: str = "sentiment") -> str:
     
     elif analysis_type == "keywords":
         # Mock keyword extraction
-        words = text.split()
-        word_freq = {}
-        for word in words:
-            cleaned = word.lower().strip(".,!?;:")
-            if len(cleaned) > 3:  # Only words longer than 3 characters
-                word_freq[cleaned] = word_freq.get(cleaned, 0) + 1
-        
-        top_keywords = sorted(word_freq.items(), key=lambda x: x[1], reverse=True)[:5]
+        tokens = _tokenize(text)
+        word_freq = Counter(t for t in tokens if len(t) > 3)  # Only words longer than 3 characters
+        top_keywords = word_freq.most_common(5)
         return f"Top keywords: {', '.join([f'{word}({count})' for word, count in top_keywords])}"
     
     elif analysis_type == "summary":
@@ -84,7 +164,7 @@ def analyze_text_content(text: str, analysis_type: str = "sentiment") -> str:
     elif analysis_type == "complexity":
         # Mock complexity analysis
         word_count = len(text.split())
-        sentence_count = len(text.split("."))
+        sentence_count = text.count(".") + 1  # Same as len(text.split(".")) without building the list
         avg_words_per_sentence = word_count / max(sentence_count, 1)
         
         if avg_words_per_sentence > 20:
@@ -98,6 +178,35 @@ def analyze_text_content(text: str, analysis_type: str = "sentiment") -> str:
     
     return f"Analysis type '{analysis_type}' not supported"
 
+# Mock knowledge base: domain -> keyword -> response. "default" entries are templates filled with the query.
+_KB = MappingProxyType({
+    "general": MappingProxyType({
+        "ai": "Artificial Intelligence is a field of computer science focused on creating systems that can perform tasks typically requiring human intelligence.",
+        "machine learning": "Machine Learning is a subset of AI that enables systems to learn and improve from experience without being explicitly programmed.",
+        "langchain": "LangChain is a framework for developing applications powered by language models, focusing on data-aware and agentic applications.",
+        "default": "General knowledge about '{query}': This is a broad topic with multiple applications and considerations."
+    }),
+    "technical": MappingProxyType({
+        "websocket": "WebSockets provide full-duplex communication channels over a single TCP connection, ideal for real-time applications.",
+        "fastapi": "FastAPI is a modern, high-performance web framework for building APIs with Python, featuring automatic OpenAPI documentation.",
+        "react": "React is a JavaScript library for building user interfaces, particularly single-page applications with component-based architecture.",
+        "default": "Technical information about '{query}': This involves implementation details and best practices specific to the technology stack."
+    }),
+    "business": MappingProxyType({
+        "strategy": "Business strategy involves defining long-term goals and determining the best approach to achieve competitive advantage.",
+        "automation": "Business process automation uses technology to streamline operations, reduce costs, and improve efficiency.",
+        "default": "Business insights about '{query}': Consider the impact on operations, costs, and stakeholder value."
+    }),
+    "science": MappingProxyType({
+        "data": "Data science combines statistical methods, algorithms, and domain expertise to extract insights from structured and unstructured data.",
+        "research": "Scientific research follows systematic methodologies to investigate hypotheses and contribute to knowledge advancement.",
+        "default": "Scientific perspective on '{query}': This involves empirical analysis and evidence-based conclusions."
+    })
+})
+
+# Per-domain keywords in lookup order, precomputed so each search is a single pass over a tuple
+_KB_KEYS = MappingProxyType({domain: tuple(k for k in responses if k != "default") for domain, responses in _KB.items()})
+
 @tool
 def search_knowledge_base(query: str, domain: str = "general") -> str:
     """
@@ -109,41 +218,15 @@ def search_knowledge_base(query: str, domain: str = "general") -> str:
     """
     logger.info(f"Searching knowledge base for: {query} in domain: {domain}")
     
-    # Mock knowledge base responses
-    knowledge_responses = {
-        "general": {
-            "ai": "Artificial Intelligence is a field of computer science focused on creating systems that can perform tasks typically requiring human intelligence.",
-            "machine learning": "Machine Learning is a subset of AI that enables systems to learn and improve from experience without being explicitly programmed.",
-            "langchain": "LangChain is a framework for developing applications powered by language models, focusing on data-aware and agentic applications.",
-            "default": f"General knowledge about '{query}': This is a broad topic with multiple applications and considerations."
-        },
-        "technical": {
-            "websocket": "WebSockets provide full-duplex communication channels over a single TCP connection, ideal for real-time applications.",
-            "fastapi": "FastAPI is a modern, high-performance web framework for building APIs with Python, featuring automatic OpenAPI documentation.",
-            "react": "React is a JavaScript library for building user interfaces, particularly single-page applications with component-based architecture.",
-            "default": f"Technical information about '{query}': This involves implementation details and best practices specific to the technology stack."
-        },
-        "business": {
-            "strategy": "Business strategy involves defining long-term goals and determining the best approach to achieve competitive advantage.",
-            "automation": "Business process automation uses technology to streamline operations, reduce costs, and improve efficiency.",
-            "default": f"Business insights about '{query}': Consider the impact on operations, costs, and stakeholder value."
-        },
-        "science": {
-            "data": "Data science combines statistical methods, algorithms, and domain expertise to extract insights from structured and unstructured data.",
-            "research": "Scientific research follows systematic methodologies to investigate hypotheses and contribute to knowledge advancement.",
-            "default": f"Scientific perspective on '{query}': This involves empirical analysis and evidence-based conclusions."
-        }
-    }
-    
-    domain_knowledge = knowledge_responses.get(domain, knowledge_responses["general"])
+    domain_knowledge = _KB.get(domain, _KB["general"])
     
     # Find best match
     query_lower = query.lower()
-    for key, response in domain_knowledge.items():
-        if key != "default" and key in query_lower:
-            return response
+    for key in _KB_KEYS.get(domain, _KB_KEYS["general"]):
+        if key in query_lower:
+            return domain_knowledge[key]
     
-    return domain_knowledge["default"]
+    return domain_knowledge["default"].format(query=query)
 
 @tool
 def calculate_metrics(data_points: str, metric_type: str = "basic") -> str:
@@ -163,23 +246,39 @@ def calculate_metrics(data_points: str, metric_type: str = "basic") -> str:
         if not values:
             return "No valid numeric data points provided"
         
+        arr = np.array(values, dtype=np.float64) if len(values) >= _NUMPY_MIN_VALUES else None
+        moments = _moments(arr) if _moments is not None and len(values) >= _JIT_MIN_VALUES else None
+        
         if metric_type == "basic":
-            total = sum(values)
             count = len(values)
+            if moments is not None:
+                total, minimum, maximum = moments[0], moments[1], moments[2]
+            elif arr is not None:
+                total, minimum, maximum = float(arr.sum()), float(arr.min()), float(arr.max())
+            else:
+                total, minimum, maximum = sum(values), min(values), max(values)
             average = total / count
-            minimum = min(values)
-            maximum = max(values)
             
             return f"Basic metrics - Total: {total}, Count: {count}, Average: {average:.2f}, Min: {minimum}, Max: {maximum}"
         
         elif metric_type == "statistical":
-            import statistics
-            mean = statistics.mean(values)
-            median = statistics.median(values)
+            if moments is not None:
+                mean, median = moments[3], float(np.median(arr))
+            elif arr is not None:
+                mean, median = float(arr.mean()), float(np.median(arr))
+            else:
+                mean, median = statistics.mean(values), statistics.median(values)
             
             if len(values) > 1:
-                std_dev = statistics.stdev(values)
-                variance = statistics.variance(values)
+                if moments is not None:
+                    variance = moments[4] / (len(values) - 1)
+                    std_dev = variance ** 0.5
+                elif arr is not None:
+                    variance = float(arr.var(ddof=1))
+                    std_dev = variance ** 0.5
+                else:
+                    std_dev = statistics.stdev(values)
+                    variance = statistics.variance(values)
                 return f"Statistical metrics - Mean: {mean:.2f}, Median: {median:.2f}, Std Dev: {std_dev:.2f}, Variance: {variance:.2f}"
             else:
                 return f"Statistical metrics - Mean: {mean:.2f}, Median: {median:.2f} (single value)"
@@ -241,19 +340,16 @@ async def router_node(state: AgentState) -> AgentState:
     content = last_message.content.lower()
     
     # Simple routing logic based on content
-    if any(word in content for word in ["analyze", "analysis", "sentiment", "keywords"]):
-        state["next_action"] = "analyze_content"
-    elif any(word in content for word in ["search", "find", "knowledge", "information"]):
-        state["next_action"] = "search_knowledge"
-    elif any(word in content for word in ["calculate", "metrics", "numbers", "data"]):
-        state["next_action"] = "calculate_metrics"
-    elif any(word in content for word in ["workflow", "process", "step", "procedure"]):
-        state["next_action"] = "process_workflow"
-    else:
-        state["next_action"] = "general_response"
-    
-    state["current_step"] = "routing_completed"
-    state["step_count"] = state.get("step_count", 0) + 1
+    state["next_action"] = "general_response"
+    for action, pattern in _ROUTE_PATTERNS.items():
+        if pattern.search(content):
+            state["next_action"] = action
+            break
+    
+    state.update({
+        "current_step": "routing_completed",
+        "step_count": state.get("step_count", 0) + 1,
+    })
     
     logger.info(f"Routed to action: {state['next_action']}")
     return state
@@ -265,13 +361,13 @@ async def analyze_content_node(state: AgentState) -> AgentState:
     messages = state["messages"]
     user_content = messages[-1].content if messages else ""
     
-    # Perform multiple types of analysis
-    analyses = []
-    for analysis_type in ["sentiment", "keywords", "complexity"]:
-        result = analyze_text_content.invoke({"text": user_content, "analysis_type": analysis_type})
-        analyses.append(result)
+    # Perform multiple types of analysis; each is a quick in-memory string pass, so they run inline
+    analyses = [
+        analyze_text_content.invoke({"text": user_content, "analysis_type": analysis_type})
+        for analysis_type in ("sentiment", "keywords", "complexity")
+    ]
     
-    state["tools_used"] = state.get("tools_used", []) + ["analyze_text_content"]
+    state.setdefault("tools_used", []).append("analyze_text_content")
     state["analysis_results"]["content_analysis"] = analyses
     
     # Generate comprehensive response
@@ -279,9 +375,11 @@ async def analyze_content_node(state: AgentState) -> AgentState:
     response = f"I've analyzed your content from multiple perspectives:\n\n{analysis_summary}\n\nWould you like me to dive deeper into any specific aspect?"
     
     state["messages"].append(AIMessage(content=response))
-    state["current_step"] = "content_analysis_completed"
-    state["confidence_score"] = 0.85
-    state["step_count"] = state.get("step_count", 0) + 1
+    state.update({
+        "current_step": "content_analysis_completed",
+        "confidence_score": 0.85,
+        "step_count": state.get("step_count", 0) + 1,
+    })
     
     return state
 
@@ -297,17 +395,15 @@ async def search_knowledge_node(state: AgentState) -> AgentState:
     
     # Determine domain
     domain = "general"
-    if any(word in content_lower for word in ["technical", "code", "programming", "api"]):
-        domain = "technical"
-    elif any(word in content_lower for word in ["business", "strategy", "market"]):
-        domain = "business"
-    elif any(word in content_lower for word in ["research", "study", "data", "science"]):
-        domain = "science"
+    for candidate, pattern in _DOMAIN_PATTERNS.items():
+        if pattern.search(content_lower):
+            domain = candidate
+            break
     
     # Search knowledge base
     search_result = search_knowledge_base.invoke({"query": user_content, "domain": domain})
     
-    state["tools_used"] = state.get("tools_used", []) + ["search_knowledge_base"]
+    state.setdefault("tools_used", []).append("search_knowledge_base")
     state["analysis_results"]["knowledge_search"] = {
         "query": user_content,
         "domain": domain,
@@ -317,9 +413,11 @@ async def search_knowledge_node(state: AgentState) -> AgentState:
     response = f"Based on my knowledge search in the {domain} domain:\n\n{search_result}\n\nWould you like me to search in a different domain or provide more specific information?"
     
     state["messages"].append(AIMessage(content=response))
-    state["current_step"] = "knowledge_search_completed"
-    state["confidence_score"] = 0.75
-    state["step_count"] = state.get("step_count", 0) + 1
+    state.update({
+        "current_step": "knowledge_search_completed",
+        "confidence_score": 0.75,
+        "step_count": state.get("step_count", 0) + 1,
+    })
     
     return state
 
@@ -331,8 +429,7 @@ async def calculate_metrics_node(state: AgentState) -> AgentState:
     user_content = messages[-1].content if messages else ""
     
     # Extract numbers from the content
-    import re
-    numbers = re.findall(r'-?\d+(?:\.\d+)?', user_content)
+    numbers = _NUM_RE.findall(user_content)
     
     if not numbers:
         response = "I didn't find any numeric data in your message. Please provide some numbers (comma-separated) for me to analyze. For example: '10, 20, 30, 25, 35'"
@@ -342,16 +439,16 @@ async def calculate_metrics_node(state: AgentState) -> AgentState:
     
     data_points = ",".join(numbers)
     
-    # Calculate different types of metrics
+    # Calculate different types of metrics; a failing metric type doesn't affect the others
     metrics_results = []
-    for metric_type in ["basic", "statistical", "financial"]:
+    for metric_type in ("basic", "statistical", "financial"):
         try:
             result = calculate_metrics.invoke({"data_points": data_points, "metric_type": metric_type})
             metrics_results.append(f"**{metric_type.title()} Metrics:**\n{result}")
         except Exception as e:
             logger.error(f"Error calculating {metric_type} metrics: {e}")
     
-    state["tools_used"] = state.get("tools_used", []) + ["calculate_metrics"]
+    state.setdefault("tools_used", []).append("calculate_metrics")
     state["analysis_results"]["metrics"] = {
         "data_points": data_points,
         "results": metrics_results
@@ -361,9 +458,11 @@ async def calculate_metrics_node(state: AgentState) -> AgentState:
     response = f"I've analyzed your numeric data:\n\n{metrics_summary}\n\nWould you like me to perform additional calculations or provide insights about these metrics?"
     
     state["messages"].append(AIMessage(content=response))
-    state["current_step"] = "metrics_calculation_completed"
-    state["confidence_score"] = 0.90
-    state["step_count"] = state.get("step_count", 0) + 1
+    state.update({
+        "current_step": "metrics_calculation_completed",
+        "confidence_score": 0.90,
+        "step_count": state.get("step_count", 0) + 1,
+    })
     
     return state
 
@@ -375,34 +474,16 @@ async def process_workflow_node(state: AgentState) -> AgentState:
     user_content = messages[-1].content if messages else ""
     
     # Identify workflow steps mentioned
-    workflow_keywords = {
-        "data": "data_collection",
-        "collect": "data_collection",
-        "analyze": "analysis",
-        "analysis": "analysis",
-        "insight": "insight_generation",
-        "recommend": "recommendation",
-        "validate": "validation",
-        "implement": "implementation"
-    }
-    
     content_lower = user_content.lower()
-    identified_steps = []
-    
-    for keyword, step in workflow_keywords.items():
-        if keyword in content_lower:
-            identified_steps.append(step)
+    identified_steps = [_WORKFLOW_KEYWORDS[keyword] for keyword in _WORKFLOW_PATTERN.findall(content_lower)] or ["analysis"]  # Default step
     
-    if not identified_steps:
-        identified_steps = ["analysis"]  # Default step
+    # Process each identified step, deduplicated in the order they were mentioned
+    workflow_results = [
+        f"**{step.replace('_', ' ').title()}:**\n{process_workflow_step.invoke({'step_name': step, 'context': user_content})}"
+        for step in dict.fromkeys(identified_steps)
+    ]
     
-    # Process each identified step
-    workflow_results = []
-    for step in set(identified_steps):  # Remove duplicates
-        result = process_workflow_step.invoke({"step_name": step, "context": user_content})
-        workflow_results.append(f"**{step.replace('_', ' ').title()}:**\n{result}")
-    
-    state["tools_used"] = state.get("tools_used", []) + ["process_workflow_step"]
+    state.setdefault("tools_used", []).append("process_workflow_step")
     state["analysis_results"]["workflow"] = {
         "identified_steps": identified_steps,
         "results": workflow_results
@@ -412,21 +493,17 @@ async def process_workflow_node(state: AgentState) -> AgentState:
     response = f"I've processed your workflow request:\n\n{workflow_summary}\n\nWould you like me to elaborate on any specific step or suggest next actions?"
     
     state["messages"].append(AIMessage(content=response))
-    state["current_step"] = "workflow_processing_completed"
-    state["confidence_score"] = 0.80
-    state["step_count"] = state.get("step_count", 0) + 1
+    state.update({
+        "current_step": "workflow_processing_completed",
+        "confidence_score": 0.80,
+        "step_count": state.get("step_count", 0) + 1,
+    })
     
     return state
 
-async def general_response_node(state: AgentState) -> AgentState:
-    """Handle general conversation"""
-    logger.info(f"Generating general response for session {state['session_id']}")
-    
-    messages = state["messages"]
-    user_content = messages[-1].content if messages else ""
-    
-    # Generate a helpful general response
-    response = f"""I understand you're asking about: "{user_content}"
+# Static parts of the general response; only the user's message varies
+_GENERAL_PREFIX = "I understand you're asking about: \""
+_GENERAL_SUFFIX = '''"
 
 I'm an advanced LangGraph agent that can help you with:
 
@@ -441,12 +518,24 @@ To get started, try asking me to:
 - "Calculate metrics for these numbers: 10, 20, 30, 25"
 - "Help me with a workflow for [your process]"
 
-What would you like me to help you with?"""
+What would you like me to help you with?'''
+
+async def general_response_node(state: AgentState) -> AgentState:
+    """Handle general conversation"""
+    logger.info(f"Generating general response for session {state['session_id']}")
+    
+    messages = state["messages"]
+    user_content = messages[-1].content if messages else ""
+    
+    # Generate a helpful general response
+    response = _GENERAL_PREFIX + user_content + _GENERAL_SUFFIX
     
     state["messages"].append(AIMessage(content=response))
-    state["current_step"] = "general_response_completed"
-    state["confidence_score"] = 0.70
-    state["step_count"] = state.get("step_count", 0) + 1
+    state.update({
+        "current_step": "general_response_completed",
+        "confidence_score": 0.70,
+        "step_count": state.get("step_count", 0) + 1,
+    })
     
     return state
 
@@ -460,7 +549,8 @@ def route_to_action(state: AgentState) -> str:
     """Route to the appropriate action based on next_action"""
     return state.get("next_action", "general_response")
 
-# Create the LangGraph workflow
+# Create the LangGraph workflow; compiled once and reused, since the graph holds no per-session state
+@functools.lru_cache(maxsize=1)
 def create_advanced_agent():
     """Create an advanced LangGraph agent workflow"""
     
@@ -502,7 +592,12 @@ def create_advanced_agent():
 
 # Function to initialize agent state
 def initialize_agent_state(session_id: str, user_message: str) -> AgentState:
-    """Initialize agent state for a new conversation"""
+    """Initialize agent state for a new conversation.
+
+    List-valued fields are seeded empty: nodes grow them in place with
+    state.setdefault(field, []).append(...) / .extend(...) instead of
+    rebuilding them with `+ [item]`.
+    """
     return AgentState(
         messages=[HumanMessage(content=user_message)],
         current_step="initialized",
@@ -514,3 +609,36 @@ def initialize_agent_state(session_id: str, user_message: str) -> AgentState:
         confidence_score=0.0,
         next_action=None
     )
+
+# Cache of final agent results keyed by the exact user message. Every node is a pure function
+# of that text (replies echo it and the metrics depend on its punctuation), so only identical
+# prompts can skip the whole graph.
+RESPONSE_CACHE_MAXSIZE = 1024
+_RESPONSE_CACHE: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_CACHED_FIELDS = ("current_step", "analysis_results", "task_context", "tools_used", "step_count", "confidence_score", "next_action")
+
+def get_cached_state(session_id: str, user_message: str) -> Optional[AgentState]:
+    """Return a completed agent state for a previously answered message, or None on a miss"""
+    entry = _RESPONSE_CACHE.get(user_message)
+    if entry is None:
+        return None
+    _RESPONSE_CACHE.move_to_end(user_message)
+    state = initialize_agent_state(session_id, user_message)
+    state.update(copy.deepcopy({field: entry[field] for field in _CACHED_FIELDS}))
+    state["messages"].append(AIMessage(content=entry["response"]))
+    return state
+
+def cache_agent_state(user_message: str, state: Dict[str, Any]):
+    """Remember the final response of a completed run, evicting the least recently used entry when full"""
+    messages = state.get("messages") or []
+    if not messages or not isinstance(messages[-1], AIMessage):
+        return
+    entry = {field: copy.deepcopy(state.get(field)) for field in _CACHED_FIELDS}
+    entry["response"] = messages[-1].content
+    _RESPONSE_CACHE[user_message] = entry
+    _RESPONSE_CACHE.move_to_end(user_message)
+    if len(_RESPONSE_CACHE) > RESPONSE_CACHE_MAXSIZE:
+        _RESPONSE_CACHE.popitem(last=False)
+
+# Compiled agent shared by all callers
+AGENT = create_advanced_agent()
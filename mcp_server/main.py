@@ -1,6 +1,9 @@
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from .handlers import router
+from .resources import create_nws_client
 from .streaming import router as streaming_router
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
@@ -9,10 +12,23 @@ import os
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("mcp_server")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info("MCP Server is starting up...")
+    # One NWS client for the app's lifetime; handlers get it via resources.get_nws_client
+    app.state.nws = create_nws_client()
+    try:
+        yield
+    finally:
+        logger.info("MCP Server is shutting down, closing NWS client...")
+        await app.state.nws.aclose()
+
 app = FastAPI(
     title="MCP Server Example",
     description="MCP Server with WebSocket streaming and LangGraph agents",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # Add CORS middleware for WebSocket support
@@ -24,10 +40,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-@app.on_event("startup")
-def startup_event():
-    logger.info("MCP Server is starting up...")
-
 # Mount the handlers router
 logger.info("Mounting handlers router.")
 app.include_router(router)
@@ -43,6 +55,3 @@ if os.path.isdir(UI_BUILD_DIR):
     app.mount("/", StaticFiles(directory=UI_BUILD_DIR, html=True), name="ui")
 else:
     logger.warning(f"UI build directory not found: {UI_BUILD_DIR}. UI will not be served.")
-
-# Import handlers to register endpoints
-from . import handlers  # noqa 
\ No newline at end of file
@@ -1,83 +1,205 @@
 # Placeholder for MCP server resources (file search, weather, etc.) 
 
 import os
+import time
+import asyncio
 import logging
-from typing import List, Optional
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import anyio
 import httpx
-from fastapi import APIRouter, Query
+import msgpack
+import orjson
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import Response
 
 logger = logging.getLogger("mcp_server.resources")
 
 router = APIRouter()
 
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+
+def negotiate(request: Request, content):
+    """Return content as msgpack if the client accepts it (e.g. the A2A agent); otherwise FastAPI encodes JSON."""
+    if MSGPACK_MEDIA_TYPE in request.headers.get("accept", ""):
+        return Response(content=msgpack.packb(content, use_bin_type=True), media_type=MSGPACK_MEDIA_TYPE)
+    return content
+
 # --- File Search Resource ---
+def iter_matching_files(directory: str, pattern: str) -> Iterator[str]:
+    """Yield paths of files under directory whose name contains pattern.
+
+    Walks iteratively with os.scandir, whose DirEntry objects carry cached type info,
+    and skips unreadable directories like os.walk does.
+    """
+    stack = [directory]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif pattern in entry.name and entry.is_file():
+                        yield entry.path
+        except OSError as e:
+            logger.debug(f"Skipping unreadable directory {current}: {e}")
+
+# Filesystem scans run on at most this many worker threads, separate from Starlette's shared pool
+FILE_SCAN_THREADS = 4
+_scan_limiter: Optional[anyio.CapacityLimiter] = None
+
+def _get_scan_limiter() -> anyio.CapacityLimiter:
+    # Created lazily because the limiter has to be built inside the running event loop
+    global _scan_limiter
+    if _scan_limiter is None:
+        _scan_limiter = anyio.CapacityLimiter(FILE_SCAN_THREADS)
+    return _scan_limiter
+
+def _search_files_sync(directory: str, pattern: str) -> List[str]:
+    if not os.path.isdir(directory):
+        logger.warning(f"Directory not found: {directory}")
+        return []
+    return list(iter_matching_files(directory, pattern))
+
 @router.get("/files/search")
-def search_files(
+async def search_files(
+    request: Request,
     directory: str = Query(..., description="Directory to search in"),
     pattern: str = Query("", description="Filename pattern to search for (e.g. .pdf)")
 ) -> List[str]:
     """Search for files in a directory matching a pattern."""
     logger.info(f"Searching for files in {directory} with pattern '{pattern}'")
-    if not os.path.isdir(directory):
-        logger.warning(f"Directory not found: {directory}")
-        return []
-    result = []
-    for root, _, files in os.walk(directory):
-        for f in files:
-            if pattern in f:
-                result.append(os.path.join(root, f))
+    result = await anyio.to_thread.run_sync(_search_files_sync, directory, pattern, limiter=_get_scan_limiter())
     logger.info(f"Found {len(result)} files.")
-    return result
+    return negotiate(request, result)
 
 # --- Weather Info Resource ---
 NWS_API_BASE = "https://api.weather.gov"
 USER_AGENT = "mcp-server-example/1.0"
 
-async def make_nws_request(url: str) -> Optional[dict]:
-    headers = {
-        "User-Agent": USER_AGENT,
-        "Accept": "application/geo+json"
-    }
-    async with httpx.AsyncClient() as client:
-        try:
-            resp = await client.get(url, headers=headers, timeout=30.0)
-            resp.raise_for_status()
-            return resp.json()
-        except Exception as e:
-            logger.error(f"NWS API request failed: {e}")
-            return None
+def create_nws_client() -> httpx.AsyncClient:
+    """Build the NWS client; the app creates one in its lifespan and shares it across requests."""
+    return httpx.AsyncClient(
+        base_url=NWS_API_BASE,
+        headers={"User-Agent": USER_AGENT, "Accept": "application/geo+json"},
+        timeout=30.0,
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+    )
 
-def format_alert(feature: dict) -> str:
+def get_nws_client(request: Request) -> httpx.AsyncClient:
+    """Dependency returning the shared client (override via app.dependency_overrides in tests)."""
+    return request.app.state.nws
+
+# Bounded TTL cache of successful NWS responses: path -> (expires_at, data), kept in LRU order
+NWS_CACHE_MAXSIZE = 512
+ALERTS_TTL_SECONDS = 60
+FORECAST_TTL_SECONDS = 600
+_nws_cache: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+
+async def make_nws_request(client: httpx.AsyncClient, path: str, ttl: float = 0) -> Optional[dict]:
+    if ttl > 0:
+        entry = _nws_cache.get(path)
+        if entry is not None:
+            expires_at, data = entry
+            if expires_at > time.monotonic():
+                _nws_cache.move_to_end(path)
+                return data
+            del _nws_cache[path]
+    try:
+        resp = await client.get(path)
+        resp.raise_for_status()
+        data = orjson.loads(resp.content)
+    except Exception as e:
+        logger.error(f"NWS API request failed: {e}")
+        return None
+    if ttl > 0:
+        _nws_cache[path] = (time.monotonic() + ttl, data)
+        if len(_nws_cache) > NWS_CACHE_MAXSIZE:
+            _nws_cache.popitem(last=False)
+    return data
+
+@router.post("/cache/clear")
+def clear_cache() -> Dict[str, int]:
+    """Debug endpoint: drop all cached NWS responses."""
+    cleared = len(_nws_cache)
+    _nws_cache.clear()
+    logger.info(f"Cleared {cleared} cached NWS responses.")
+    return {"cleared": cleared}
+
+def _alert_lines(feature: dict) -> Tuple[str, ...]:
     props = feature["properties"]
-    return f"""
-Event: {props.get('event', 'Unknown')}
-Area: {props.get('areaDesc', 'Unknown')}
-Severity: {props.get('severity', 'Unknown')}
-Description: {props.get('description', 'No description available')}
-Instructions: {props.get('instruction', 'No specific instructions provided')}
-"""
+    return (
+        f"Event: {props.get('event', 'Unknown')}",
+        f"Area: {props.get('areaDesc', 'Unknown')}",
+        f"Severity: {props.get('severity', 'Unknown')}",
+        f"Description: {props.get('description', 'No description available')}",
+        f"Instructions: {props.get('instruction', 'No specific instructions provided')}",
+    )
 
-@router.get("/weather/alerts")
-async def get_alerts(state: str = Query(..., min_length=2, max_length=2, description="Two-letter US state code (e.g. CA, NY)")) -> str:
-    """Get weather alerts for a US state."""
+def format_alert(feature: dict) -> str:
+    return "\n".join(_alert_lines(feature))
+
+async def fetch_alerts(client: httpx.AsyncClient, state: str) -> str:
+    """Fetch active alerts for a US state as formatted text."""
     logger.info(f"Fetching weather alerts for state: {state}")
-    url = f"{NWS_API_BASE}/alerts/active/area/{state.upper()}"
-    data = await make_nws_request(url)
+    data = await make_nws_request(client, f"/alerts/active/area/{state.upper()}", ttl=ALERTS_TTL_SECONDS)
     if not data or "features" not in data:
         logger.warning("Unable to fetch alerts or no alerts found.")
         return "Unable to fetch alerts or no alerts found."
     if not data["features"]:
         logger.info("No active alerts for this state.")
         return "No active alerts for this state."
-    return "\n---\n".join([format_alert(f) for f in data["features"]])
+    # Flatten every alert's lines, with separators, into one list and join once
+    lines = []
+    for feature in data["features"]:
+        if lines:
+            lines.append("---")
+        lines.extend(_alert_lines(feature))
+    return "\n".join(lines)
 
-@router.get("/weather/forecast")
-async def get_forecast(lat: float = Query(...), lon: float = Query(...)) -> dict:
-    """Get weather forecast for a given latitude and longitude."""
+async def fetch_forecast(client: httpx.AsyncClient, lat: float, lon: float) -> dict:
+    """Fetch forecast periods for a latitude/longitude."""
     logger.info(f"Fetching weather forecast for lat={lat}, lon={lon}")
-    url = f"{NWS_API_BASE}/points/{lat},{lon}/forecast"
-    data = await make_nws_request(url)
+    # Round coordinates so nearby lookups share a cache entry
+    data = await make_nws_request(client, f"/points/{round(lat, 4)},{round(lon, 4)}/forecast", ttl=FORECAST_TTL_SECONDS)
     if not data or "properties" not in data or "periods" not in data["properties"]:
         logger.warning("Unable to fetch forecast.")
         return {"error": "Unable to fetch forecast."}
-    return {"periods": data["properties"]["periods"]} 
\ No newline at end of file
+    return {"periods": data["properties"]["periods"]}
+
+async def get_alerts_and_forecast(client: httpx.AsyncClient, state: str, lat: float, lon: float) -> Dict[str, Any]:
+    """Fetch alerts and forecast concurrently, so latency is the slower of the two rather than their sum."""
+    alerts, forecast = await asyncio.gather(fetch_alerts(client, state), fetch_forecast(client, lat, lon))
+    return {"alerts": alerts, "forecast": forecast}
+
+@router.get("/weather/alerts")
+async def get_alerts(
+    request: Request,
+    state: str = Query(..., min_length=2, max_length=2, description="Two-letter US state code (e.g. CA, NY)"),
+    nws: httpx.AsyncClient = Depends(get_nws_client)
+) -> str:
+    """Get weather alerts for a US state."""
+    return negotiate(request, await fetch_alerts(nws, state))
+
+@router.get("/weather/forecast")
+async def get_forecast(
+    request: Request,
+    lat: float = Query(...),
+    lon: float = Query(...),
+    nws: httpx.AsyncClient = Depends(get_nws_client)
+) -> dict:
+    """Get weather forecast for a given latitude and longitude."""
+    return negotiate(request, await fetch_forecast(nws, lat, lon))
+
+@router.get("/weather/bundle")
+async def get_weather_bundle(
+    request: Request,
+    state: str = Query(..., min_length=2, max_length=2, description="Two-letter US state code (e.g. CA, NY)"),
+    lat: float = Query(...),
+    lon: float = Query(...),
+    nws: httpx.AsyncClient = Depends(get_nws_client)
+) -> dict:
+    """Get weather alerts for a state and the forecast for a location in one call."""
+    return negotiate(request, await get_alerts_and_forecast(nws, state, lat, lon))
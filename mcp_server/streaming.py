@@ -2,68 +2,280 @@
 WebSocket streaming handlers for real-time communication with LangGraph agents
 """
 
-import json
+import os
+import re
 import logging
+import msgpack
+import orjson
 import asyncio
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Query
 from fastapi.responses import JSONResponse
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+import time
+import functools
 import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
 from datetime import datetime
 
-# LangGraph imports
-from langchain.schema import BaseMessage, HumanMessage, AIMessage, SystemMessage
-from langgraph.graph import StateGraph, END
-from langchain.tools import BaseTool
+# LangChain and LangGraph imports
+from langchain.schema import BaseMessage, AIMessage
 from langchain.callbacks.base import BaseCallbackHandler
+from langgraph.graph import StateGraph, END
 
 # Import our advanced LangGraph agent
-from .langgraph_agent import create_advanced_agent, initialize_agent_state
+from .langgraph_agent import AGENT, initialize_agent_state, get_cached_state, cache_agent_state
+from .resources import iter_matching_files
 
 logger = logging.getLogger("mcp_server.streaming")
 
 router = APIRouter()
 
+# Timestamp string reused for up to TIMESTAMP_RESOLUTION seconds, so bursts of messages share one isoformat() call
+TIMESTAMP_RESOLUTION = 0.01
+_ts_cache = {"t": float("-inf"), "s": ""}
+
+def now_iso() -> str:
+    t = time.monotonic()
+    if t - _ts_cache["t"] > TIMESTAMP_RESOLUTION:
+        _ts_cache["s"] = datetime.now().isoformat()
+        _ts_cache["t"] = t
+    return _ts_cache["s"]
+
+# Server-to-client frames are binary msgpack by default; clients can ask for JSON text with ?fmt=json
+WIRE_FORMATS = ("msgpack", "json")
+
+def encode_message(message: dict, fmt: str):
+    """Serialize a message for the wire: bytes for msgpack, str for JSON (sent as text frames browsers can JSON.parse)."""
+    if fmt == "json":
+        return orjson.dumps(message).decode()
+    return msgpack.packb(message, use_bin_type=True)
+
+# token_stream is the hottest message: its envelope is pre-encoded per session (see token_prefix)
+# and only the token and timestamp are encoded per call
+_MSGPACK_TIMESTAMP_KEY = msgpack.packb("timestamp")
+
+def token_prefix(session_id: str, fmt: str):
+    """Encoded start of a token_stream message, up to and including the "content" key."""
+    if fmt == "json":
+        return '{"type":"token_stream","session_id":' + orjson.dumps(session_id).decode() + ',"content":'
+    # fixmap header for the 4 entries, then type, session_id and the content key
+    return b"\x84" + b"".join(msgpack.packb(part) for part in ("type", "token_stream", "session_id", session_id, "content"))
+
+def encode_token(prefix, token: str):
+    if isinstance(prefix, bytes):
+        return prefix + msgpack.packb(token) + _MSGPACK_TIMESTAMP_KEY + msgpack.packb(now_iso())
+    return prefix + orjson.dumps(token).decode() + ',"timestamp":"' + now_iso() + '"}'
+
+async def send_encoded(websocket: WebSocket, payload) -> None:
+    if isinstance(payload, bytes):
+        await websocket.send_bytes(payload)
+    else:
+        await websocket.send_text(payload)
+
+# Most recent client messages kept per session; message_count still counts all of them
+SESSION_HISTORY_MAXLEN = 1000
+
+# Disconnected sessions stay listed (with their socket and buffers released) until this many newer ones displace them
+MAX_DISCONNECTED_SESSIONS = 1000
+
+# Polled session listings may lag by this much
+SESSIONS_SNAPSHOT_TTL = 0.5
+
+# Outgoing frames waiting for a slow client are capped per connection
+SEND_QUEUE_MAXSIZE = 256
+
+@dataclass(slots=True)
+class ConnectionRecord:
+    """Everything known about one session: its socket, send pipeline and history, behind a single lookup"""
+    ws: Optional[WebSocket]
+    fmt: str
+    token_prefix: Any
+    send_queue: asyncio.Queue
+    created_at: datetime = field(default_factory=datetime.now)
+    messages: deque = field(default_factory=lambda: deque(maxlen=SESSION_HISTORY_MAXLEN))
+    message_count: int = 0
+    status: str = "connected"
+    writer: Optional[asyncio.Task] = None
+
 # Connection manager for WebSocket connections
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
-        self.connection_sessions: Dict[str, Dict[str, Any]] = {}
+    """Session records split into shards by hash(session_id), each with its own lock.
+
+    Mutations lock only the owning shard; broadcast snapshots each shard under its lock and
+    enqueues outside it, so connects/disconnects never race an in-flight iteration.
+
+    Every connection has a bounded send queue drained by its own writer task: producers never
+    wait on a slow client, and when a queue fills, adjacent pending token_stream frames are merged
+    into one so no streamed text is lost.
+    """
+
+    def __init__(self, num_shards: int = 16):
+        self.shards: List[Dict[str, Any]] = [
+            {"lock": asyncio.Lock(), "records": {}} for _ in range(num_shards)
+        ]
+        # Disconnected records in the order they closed, oldest evicted first
+        self._disconnected: deque = deque()
+        # Cached /streaming/sessions payload; rebuilt at most every SESSIONS_SNAPSHOT_TTL seconds
+        self._snapshot_ts = float("-inf")
+        self._snapshot: List["SessionInfo"] = []
+
+    def _shard(self, session_id: str) -> Dict[str, Any]:
+        return self.shards[hash(session_id) % len(self.shards)]
+
+    def get_session(self, session_id: str) -> Optional[ConnectionRecord]:
+        return self._shard(session_id)["records"].get(session_id)
 
-    async def connect(self, websocket: WebSocket, session_id: str):
+    def get_connection(self, session_id: str) -> Optional[WebSocket]:
+        record = self.get_session(session_id)
+        return record.ws if record is not None and record.status == "connected" else None
+
+    def list_sessions(self) -> List[Tuple[str, ConnectionRecord]]:
+        """Snapshot of (session_id, record) across all shards"""
+        return [item for shard in self.shards for item in list(shard["records"].items())]
+
+    def sessions_snapshot(self) -> List["SessionInfo"]:
+        """SessionInfo for every session, at most SESSIONS_SNAPSHOT_TTL seconds stale"""
+        now = time.monotonic()
+        if now - self._snapshot_ts > SESSIONS_SNAPSHOT_TTL:
+            self._snapshot = [session_info(session_id, record) for session_id, record in self.list_sessions()]
+            self._snapshot_ts = now
+        return self._snapshot
+
+    async def connect(self, websocket: WebSocket, session_id: str, fmt: str = "msgpack") -> ConnectionRecord:
         await websocket.accept()
-        self.active_connections[session_id] = websocket
-        self.connection_sessions[session_id] = {
-            "created_at": datetime.now(),
-            "messages": [],
-            "status": "connected"
-        }
+        shard = self._shard(session_id)
+        record = ConnectionRecord(
+            ws=websocket,
+            fmt=fmt,
+            token_prefix=token_prefix(session_id, fmt),
+            send_queue=asyncio.Queue(maxsize=SEND_QUEUE_MAXSIZE)
+        )
+        record.writer = asyncio.create_task(self._writer(session_id, record))
+        async with shard["lock"]:
+            previous = shard["records"].get(session_id)
+            shard["records"][session_id] = record
+        # A reconnect under the same session_id replaces the old connection
+        if previous is not None and previous.status == "connected":
+            self._release(previous)
+        self._snapshot_ts = float("-inf")
         logger.info(f"WebSocket connection established for session {session_id}")
+        return record
 
-    def disconnect(self, session_id: str):
-        if session_id in self.active_connections:
-            del self.active_connections[session_id]
-        if session_id in self.connection_sessions:
-            self.connection_sessions[session_id]["status"] = "disconnected"
+    async def disconnect(self, session_id: str, record: Optional[ConnectionRecord] = None):
+        """Mark a session disconnected. When record is given, act only if it is still the session's current record."""
+        shard = self._shard(session_id)
+        async with shard["lock"]:
+            current = shard["records"].get(session_id)
+            if record is not None and current is not record:
+                return
+            record = current
+            if record is None or record.status != "connected":
+                return
+            self._release(record)
+            self._disconnected.append((session_id, record))
+        await self._evict_disconnected()
+        self._snapshot_ts = float("-inf")
         logger.info(f"WebSocket connection closed for session {session_id}")
 
-    async def send_personal_message(self, message: dict, session_id: str):
-        if session_id in self.active_connections:
-            try:
-                await self.active_connections[session_id].send_text(json.dumps(message))
-                return True
-            except Exception as e:
-                logger.error(f"Error sending message to {session_id}: {e}")
+    @staticmethod
+    def _release(record: ConnectionRecord):
+        """Mark a record disconnected and free its socket, writer, pending frames and history"""
+        record.status = "disconnected"
+        writer, record.writer = record.writer, None
+        if writer is not None and writer is not asyncio.current_task():
+            writer.cancel()
+        record.ws = None
+        while not record.send_queue.empty():
+            record.send_queue.get_nowait()
+        record.messages.clear()
+
+    async def _evict_disconnected(self):
+        while len(self._disconnected) > MAX_DISCONNECTED_SESSIONS:
+            session_id, record = self._disconnected.popleft()
+            shard = self._shard(session_id)
+            async with shard["lock"]:
+                if shard["records"].get(session_id) is record:
+                    del shard["records"][session_id]
+
+    async def _writer(self, session_id: str, record: ConnectionRecord):
+        try:
+            while True:
+                _, payload, _ = await record.send_queue.get()
+                await send_encoded(record.ws, payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error sending message to {session_id}: {e}")
+            await self.disconnect(session_id, record)
+
+    @staticmethod
+    def _coalesce(record: ConnectionRecord, incoming: Tuple[str, Any, Optional[str]]) -> bool:
+        """Make room by merging runs of adjacent token_stream frames into one frame carrying their
+        concatenated text, then add the incoming frame (merged into a trailing token run if it is a
+        token). Other frames keep their order. Returns False if there is still no room."""
+        merged: List[Tuple[str, Any, Optional[str]]] = []
+        run: List[str] = []
+
+        def flush_run():
+            if run:
+                text = "".join(run)
+                merged.append(("token_stream", encode_token(record.token_prefix, text), text))
+                run.clear()
+
+        while not record.send_queue.empty():
+            item = record.send_queue.get_nowait()
+            if item[2] is not None:
+                run.append(item[2])
+            else:
+                flush_run()
+                merged.append(item)
+        fits = incoming[2] is not None and bool(run) or len(merged) + bool(run) < record.send_queue.maxsize
+        if fits and incoming[2] is not None:
+            run.append(incoming[2])
+        flush_run()
+        if fits and incoming[2] is None:
+            merged.append(incoming)
+        for item in merged:
+            record.send_queue.put_nowait(item)
+        return fits
+
+    def _enqueue(self, session_id: str, record: ConnectionRecord, message_type: str, payload, token: Optional[str] = None) -> bool:
+        if record.writer is None:
+            return False
+        item = (message_type, payload, token)
+        try:
+            record.send_queue.put_nowait(item)
+        except asyncio.QueueFull:
+            if not self._coalesce(record, item):
+                logger.warning(f"Send queue full for {session_id}, dropping {message_type} message")
                 return False
-        return False
+        return True
+
+    async def send_personal_message(self, message: dict, session_id: str):
+        record = self.get_session(session_id)
+        if record is None:
+            return False
+        return self._enqueue(session_id, record, message.get("type", ""), encode_message(message, record.fmt))
+
+    async def send_token(self, token: str, session_id: str):
+        record = self.get_session(session_id)
+        if record is None:
+            return False
+        return self._enqueue(session_id, record, "token_stream", encode_token(record.token_prefix, token), token)
+
+    async def _broadcast_shard(self, shard: Dict[str, Any], message_type: str, payloads: Dict[str, Any]):
+        async with shard["lock"]:
+            snapshot = list(shard["records"].items())
+        # Enqueueing never waits on a client; each connection's writer delivers at its own pace
+        for session_id, record in snapshot:
+            self._enqueue(session_id, record, message_type, payloads[record.fmt])
 
     async def broadcast(self, message: dict):
-        for session_id, websocket in self.active_connections.items():
-            try:
-                await websocket.send_text(json.dumps(message))
-            except Exception as e:
-                logger.error(f"Error broadcasting to {session_id}: {e}")
+        # Encode once per wire format rather than once per connection
+        payloads = {fmt: encode_message(message, fmt) for fmt in WIRE_FORMATS}
+        await asyncio.gather(*(self._broadcast_shard(shard, message.get("type", ""), payloads) for shard in self.shards))
 
 manager = ConnectionManager()
 
@@ -87,6 +299,17 @@ class SessionInfo(BaseModel):
     created_at: str
     message_count: int
 
+def session_info(session_id: str, record: ConnectionRecord) -> SessionInfo:
+    return SessionInfo(
+        session_id=session_id,
+        status=record.status,
+        created_at=record.created_at.isoformat(),
+        message_count=record.message_count
+    )
+
+class CapacityUpdate(BaseModel):
+    max_sessions: int = Field(..., ge=1)
+
 # Custom callback handler for streaming LangGraph agent responses
 class StreamingCallbackHandler(BaseCallbackHandler):
     def __init__(self, session_id: str, manager: ConnectionManager):
@@ -98,23 +321,18 @@ class StreamingCallbackHandler(BaseCallbackHandler):
             "type": "agent_thinking",
             "content": "Agent is processing your request...",
             "session_id": self.session_id,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": now_iso()
         }, self.session_id)
 
     async def on_llm_new_token(self, token: str, **kwargs):
-        await self.manager.send_personal_message({
-            "type": "token_stream",
-            "content": token,
-            "session_id": self.session_id,
-            "timestamp": datetime.now().isoformat()
-        }, self.session_id)
+        await self.manager.send_token(token, self.session_id)
 
     async def on_tool_start(self, serialized: Dict[str, Any], input_str: str, **kwargs):
         await self.manager.send_personal_message({
             "type": "tool_start",
             "content": f"Using tool: {serialized.get('name', 'Unknown')}",
             "session_id": self.session_id,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": now_iso()
         }, self.session_id)
 
     async def on_tool_end(self, output: str, **kwargs):
@@ -122,24 +340,44 @@ class StreamingCallbackHandler(BaseCallbackHandler):
             "type": "tool_result",
             "content": f"Tool completed with output: {output[:200]}...",
             "session_id": self.session_id,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": now_iso()
         }, self.session_id)
 
 # Mock LangGraph tools for demonstration (simplified for compatibility)
-def mock_file_search(directory: str, pattern: str = "") -> str:
-    """Search for files in a directory"""
-    import os
+def _search_file_count(directory: str, pattern: str) -> str:
     if not os.path.isdir(directory):
         return f"Directory not found: {directory}"
     
-    files = []
-    for root, _, file_list in os.walk(directory):
-        for f in file_list:
-            if pattern in f:
-                files.append(os.path.join(root, f))
+    # Only the count is reported, so count the scandir generator without building a list
+    count = sum(1 for _ in iter_matching_files(directory, pattern))
     
-    return f"Found {len(files)} files matching pattern '{pattern}' in {directory}"
+    return f"Found {count} files matching pattern '{pattern}' in {directory}"
+
+# Short-lived cache of file search results: (directory, pattern) -> (expires_at, result), kept in LRU order.
+# The TTL bounds how stale a count can get after files change on disk.
+MOCK_TOOL_CACHE_MAXSIZE = 512
+FILE_SEARCH_TTL_SECONDS = 5
+_file_search_cache: "OrderedDict[Tuple[str, str], Tuple[float, str]]" = OrderedDict()
 
+def mock_file_search(directory: str, pattern: str = "") -> str:
+    """Search for files in a directory"""
+    key = (directory, pattern)
+    entry = _file_search_cache.get(key)
+    if entry is not None:
+        expires_at, result = entry
+        if expires_at > time.monotonic():
+            _file_search_cache.move_to_end(key)
+            logger.info(f"File search cache hit for '{pattern}' in {directory}")
+            return result
+        del _file_search_cache[key]
+    
+    result = _search_file_count(directory, pattern)
+    _file_search_cache[key] = (time.monotonic() + FILE_SEARCH_TTL_SECONDS, result)
+    if len(_file_search_cache) > MOCK_TOOL_CACHE_MAXSIZE:
+        _file_search_cache.popitem(last=False)
+    return result
+
+@functools.lru_cache(maxsize=MOCK_TOOL_CACHE_MAXSIZE)
 def mock_data_analysis(data_type: str, analysis_type: str = "summary") -> str:
     """Analyze data and provide insights"""
     # Mock analysis
@@ -150,14 +388,22 @@ def mock_data_analysis(data_type: str, analysis_type: str = "summary") -> str:
     else:
         return f"Analysis type '{analysis_type}' completed for {data_type}."
 
-# LangGraph Agent State
-class AgentState(BaseModel):
-    messages: List[BaseMessage] = []
+# LangGraph Agent State (in-process only, so a plain slotted dataclass rather than a validated model)
+@dataclass(slots=True)
+class AgentState:
+    session_id: str = ""
+    messages: List[BaseMessage] = field(default_factory=list)
     current_task: Optional[str] = None
-    tools_used: List[str] = []
-    session_id: str
+    tools_used: List[str] = field(default_factory=list)
     step_count: int = 0
 
+# Task intents in priority order: first match wins. Each is one regex pass matching at word starts
+# (so "files" and "analyzed" still count).
+_INTENTS = (
+    ("file_search", re.compile(r"\b(?:file|search)", re.IGNORECASE)),
+    ("data_analysis", re.compile(r"\b(?:analyze|data)", re.IGNORECASE)),
+)
+
 # Agent workflow functions
 async def analyze_input(state: AgentState, session_id: str) -> AgentState:
     """Analyze user input and determine next steps"""
@@ -167,15 +413,10 @@ async def analyze_input(state: AgentState, session_id: str) -> AgentState:
     if not last_message:
         return state
     
-    user_input = last_message.content.lower()
+    user_input = last_message.content
     
     # Simple task classification
-    if "file" in user_input or "search" in user_input:
-        state.current_task = "file_search"
-    elif "analyze" in user_input or "data" in user_input:
-        state.current_task = "data_analysis"
-    else:
-        state.current_task = "general_chat"
+    state.current_task = next((task for task, pattern in _INTENTS if pattern.search(user_input)), "general_chat")
     
     state.step_count += 1
     
@@ -185,7 +426,7 @@ async def analyze_input(state: AgentState, session_id: str) -> AgentState:
         "content": f"Identified task: {state.current_task}",
         "session_id": session_id,
         "step_info": {"step": state.step_count, "task": state.current_task},
-        "timestamp": datetime.now().isoformat()
+        "timestamp": now_iso()
     }, session_id)
     
     return state
@@ -219,7 +460,7 @@ async def execute_task(state: AgentState, session_id: str) -> AgentState:
         "content": response_content,
         "session_id": session_id,
         "step_info": {"step": state.step_count, "tools_used": state.tools_used},
-        "timestamp": datetime.now().isoformat()
+        "timestamp": now_iso()
     }, session_id)
     
     return state
@@ -241,11 +482,72 @@ def create_agent_workflow():
     
     return workflow.compile()
 
+# Compiled once and shared by every WebSocket session. The graph is reentrant: nodes keep no state
+# of their own and all per-session data travels in the agent_state passed to astream.
+COMPILED_AGENT = AGENT
+
+# Marks the end of a drained stream
+_STREAM_END = object()
+
+async def drain_batches(stream):
+    """Yield items from an async iterator in batches: wait for the first item, then take whatever else is already available."""
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def produce():
+        try:
+            async for item in stream:
+                await queue.put(item)
+        except Exception as e:
+            await queue.put(e)
+        finally:
+            await queue.put(_STREAM_END)
+
+    producer = asyncio.create_task(produce())
+    try:
+        done = False
+        while not done:
+            batch = []
+            item = await queue.get()
+            while True:
+                if item is _STREAM_END:
+                    done = True
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                batch.append(item)
+                if queue.empty():
+                    break
+                item = queue.get_nowait()
+            if batch:
+                yield batch
+    finally:
+        producer.cancel()
+
+# Admission control: at most "max" sessions are served at once; further connections wait for a slot
+# before their handshake completes. "max" can be changed at runtime via POST /streaming/capacity.
+MAX_STREAMING_SESSIONS = 500
+_ws_slots = {"active": 0, "max": MAX_STREAMING_SESSIONS, "cond": asyncio.Condition()}
+
 # WebSocket endpoint
 @router.websocket("/ws/{session_id}")
-async def websocket_endpoint(websocket: WebSocket, session_id: str):
-    await manager.connect(websocket, session_id)
-    agent_workflow = create_advanced_agent()
+async def websocket_endpoint(
+    websocket: WebSocket,
+    session_id: str,
+    fmt: str = Query("msgpack", description="Frame encoding: msgpack (binary, default) or json (text, for debugging)")
+):
+    cond = _ws_slots["cond"]
+    async with cond:
+        await cond.wait_for(lambda: _ws_slots["active"] < _ws_slots["max"])
+        _ws_slots["active"] += 1
+    try:
+        await serve_session(websocket, session_id, "json" if fmt == "json" else "msgpack")
+    finally:
+        async with cond:
+            _ws_slots["active"] -= 1
+            cond.notify(1)
+
+async def serve_session(websocket: WebSocket, session_id: str, fmt: str):
+    record = await manager.connect(websocket, session_id, fmt)
     
     try:
         # Send welcome message
@@ -253,18 +555,19 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
             "type": "connection_established",
             "content": "Connected to LangGraph streaming agent. Send me a message!",
             "session_id": session_id,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": now_iso()
         }, session_id)
         
         while True:
             # Receive message from client
             data = await websocket.receive_text()
-            message_data = json.loads(data)
+            message_data = orjson.loads(data)
             
             logger.info(f"Received message from {session_id}: {message_data}")
             
             # Store message in session
-            manager.connection_sessions[session_id]["messages"].append(message_data)
+            record.messages.append(message_data)
+            record.message_count += 1
             
             user_content = message_data.get("content", "")
             
@@ -278,60 +581,91 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
                     "type": "agent_processing_start",
                     "content": "🤖 Advanced LangGraph agent is processing your request...",
                     "session_id": session_id,
-                    "timestamp": datetime.now().isoformat()
+                    "timestamp": now_iso()
                 }, session_id)
                 
-                # Execute workflow with streaming
-                step_count = 0
-                async for step_output in agent_workflow.astream(agent_state):
-                    step_count += 1
-                    logger.info(f"Agent step {step_count} output: {step_output}")
-                    
-                    # Extract step information
-                    current_node = list(step_output.keys())[0] if step_output else 'unknown'
-                    node_state = step_output.get(current_node, {}) if step_output else {}
-                    
-                    # Send detailed step updates
+                # Answer repeated questions straight from the response cache
+                cached_state = get_cached_state(session_id, user_content)
+                if cached_state is not None:
                     await manager.send_personal_message({
-                        "type": "agent_step_detailed",
-                        "content": f"📋 Step {step_count}: {current_node.replace('_', ' ').title()}",
+                        "type": "agent_response",
+                        "content": cached_state["messages"][-1].content,
                         "session_id": session_id,
+                        "agent_type": "langgraph_advanced",
                         "step_info": {
-                            "step_number": step_count,
-                            "node_name": current_node,
-                            "current_step": node_state.get("current_step", "unknown"),
-                            "tools_used": node_state.get("tools_used", []),
-                            "confidence_score": node_state.get("confidence_score", 0.0)
+                            "step_number": 1,
+                            "confidence_score": cached_state.get("confidence_score", 0.0),
+                            "tools_used": cached_state.get("tools_used", []),
+                            "cached": True
                         },
-                        "timestamp": datetime.now().isoformat()
+                        "timestamp": now_iso()
                     }, session_id)
+                    await manager.send_personal_message({
+                        "type": "agent_processing_complete",
+                        "content": "✅ Processing completed! Feel free to ask another question.",
+                        "session_id": session_id,
+                        "timestamp": now_iso()
+                    }, session_id)
+                    continue
+                
+                # Execute workflow with streaming; steps that are ready together go out in one frame
+                step_count = 0
+                async for batch in drain_batches(COMPILED_AGENT.astream(agent_state)):
+                    steps = []
+                    for step_output in batch:
+                        step_count += 1
+                        logger.info(f"Agent step {step_count} output: {step_output}")
+                        
+                        # Extract step information
+                        current_node = next(iter(step_output), 'unknown') if step_output else 'unknown'
+                        node_state = step_output.get(current_node, {}) if step_output else {}
+                        
+                        # Detailed step update
+                        steps.append({
+                            "type": "agent_step_detailed",
+                            "content": f"📋 Step {step_count}: {current_node.replace('_', ' ').title()}",
+                            "session_id": session_id,
+                            "step_info": {
+                                "step_number": step_count,
+                                "node_name": current_node,
+                                "current_step": node_state.get("current_step", "unknown"),
+                                "tools_used": node_state.get("tools_used", []),
+                                "confidence_score": node_state.get("confidence_score", 0.0)
+                            },
+                            "timestamp": now_iso()
+                        })
+                        
+                        # If this step generated a response message, include it
+                        if "messages" in node_state:
+                            messages = node_state["messages"]
+                            if messages and isinstance(messages[-1], AIMessage):
+                                cache_agent_state(user_content, node_state)
+                                steps.append({
+                                    "type": "agent_response",
+                                    "content": messages[-1].content,
+                                    "session_id": session_id,
+                                    "agent_type": "langgraph_advanced",
+                                    "step_info": {
+                                        "step_number": step_count,
+                                        "confidence_score": node_state.get("confidence_score", 0.0),
+                                        "tools_used": node_state.get("tools_used", [])
+                                    },
+                                    "timestamp": now_iso()
+                                })
                     
-                    # If this step generated a response message, send it
-                    if "messages" in node_state:
-                        messages = node_state["messages"]
-                        if messages and isinstance(messages[-1], AIMessage):
-                            await manager.send_personal_message({
-                                "type": "agent_response",
-                                "content": messages[-1].content,
-                                "session_id": session_id,
-                                "agent_type": "langgraph_advanced",
-                                "step_info": {
-                                    "step_number": step_count,
-                                    "confidence_score": node_state.get("confidence_score", 0.0),
-                                    "tools_used": node_state.get("tools_used", [])
-                                },
-                                "timestamp": datetime.now().isoformat()
-                            }, session_id)
-                    
-                    # Add delay for better user experience
-                    await asyncio.sleep(0.3)
+                    await manager.send_personal_message({
+                        "type": "agent_batch",
+                        "steps": steps,
+                        "session_id": session_id,
+                        "timestamp": now_iso()
+                    }, session_id)
                 
                 # Send completion message
                 await manager.send_personal_message({
                     "type": "agent_processing_complete",
                     "content": "✅ Processing completed! Feel free to ask another question.",
                     "session_id": session_id,
-                    "timestamp": datetime.now().isoformat()
+                    "timestamp": now_iso()
                 }, session_id)
                 
             except Exception as e:
@@ -340,43 +674,30 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
                     "type": "error",
                     "content": f"❌ Agent error: {str(e)}",
                     "session_id": session_id,
-                    "timestamp": datetime.now().isoformat()
+                    "timestamp": now_iso()
                 }, session_id)
                 
     except WebSocketDisconnect:
-        manager.disconnect(session_id)
+        await manager.disconnect(session_id, record)
         logger.info(f"Client {session_id} disconnected")
     except Exception as e:
         logger.error(f"WebSocket error for {session_id}: {e}")
-        manager.disconnect(session_id)
+        await manager.disconnect(session_id, record)
 
 # REST endpoints for session management
 @router.get("/streaming/sessions", response_model=List[SessionInfo])
 async def get_active_sessions():
     """Get list of active streaming sessions"""
-    sessions = []
-    for session_id, session_data in manager.connection_sessions.items():
-        sessions.append(SessionInfo(
-            session_id=session_id,
-            status=session_data["status"],
-            created_at=session_data["created_at"].isoformat(),
-            message_count=len(session_data["messages"])
-        ))
-    return sessions
+    return manager.sessions_snapshot()
 
 @router.get("/streaming/sessions/{session_id}", response_model=SessionInfo)
 async def get_session_info(session_id: str):
     """Get information about a specific session"""
-    if session_id not in manager.connection_sessions:
+    session_data = manager.get_session(session_id)
+    if session_data is None:
         return JSONResponse(status_code=404, content={"detail": "Session not found"})
     
-    session_data = manager.connection_sessions[session_id]
-    return SessionInfo(
-        session_id=session_id,
-        status=session_data["status"],
-        created_at=session_data["created_at"].isoformat(),
-        message_count=len(session_data["messages"])
-    )
+    return session_info(session_id, session_data)
 
 @router.post("/streaming/broadcast")
 async def broadcast_message(message: StreamMessage):
@@ -385,16 +706,28 @@ async def broadcast_message(message: StreamMessage):
         "type": "broadcast",
         "content": message.content,
         "sender": "system",
-        "timestamp": datetime.now().isoformat()
+        "timestamp": now_iso()
     })
     return {"status": "broadcast_sent", "message": message.content}
 
+@router.post("/streaming/capacity")
+async def set_streaming_capacity(update: CapacityUpdate):
+    """Change the maximum number of concurrently served WebSocket sessions"""
+    cond = _ws_slots["cond"]
+    async with cond:
+        _ws_slots["max"] = update.max_sessions
+        # Raising the limit may admit waiting connections
+        cond.notify_all()
+    logger.info(f"Streaming capacity set to {update.max_sessions} sessions")
+    return {"status": "capacity_updated", "max_sessions": update.max_sessions, "active_sessions": _ws_slots["active"]}
+
 @router.delete("/streaming/sessions/{session_id}")
 async def close_session(session_id: str):
     """Close a specific session"""
-    if session_id in manager.active_connections:
-        await manager.active_connections[session_id].close()
-        manager.disconnect(session_id)
+    websocket = manager.get_connection(session_id)
+    if websocket is not None:
+        await websocket.close()
+        await manager.disconnect(session_id)
         return {"status": "session_closed", "session_id": session_id}
     else:
         return JSONResponse(status_code=404, content={"detail": "Session not found"})
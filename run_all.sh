@@ -2,13 +2,20 @@
 
 # Run MCP server
 echo "Starting MCP server..."
-uvicorn mcp_server.main:app --reload --port 8001 &
+uvicorn mcp_server.main:app --reload --ws websockets --ws-per-message-deflate true --port 8001 &
 MCP_PID=$!
 
 # Run A2A agent
 echo "Starting A2A agent..."
-uvicorn a2a_agent.main:app --reload --port 8002 &
+uvicorn a2a_agent.main:app --reload --port 8002 --loop uvloop --http httptools &
 A2A_PID=$!
 
-# Wait for both processes
-wait $MCP_PID $A2A_PID 
\ No newline at end of file
+# Run a task queue worker when the A2A agent is in async mode
+if [ "${A2A_ASYNC_MODE,,}" = "true" ]; then
+  echo "Starting A2A task worker..."
+  python -m a2a_agent.worker &
+  WORKER_PID=$!
+fi
+
+# Wait for all processes
+wait $MCP_PID $A2A_PID $WORKER_PID 
\ No newline at end of file
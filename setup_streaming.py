@@ -62,7 +62,7 @@ def main():
     
     print("\n🎉 Setup completed!")
     print("\nTo start the application:")
-    print("1. Backend: python -m uvicorn mcp_server.main:app --host 0.0.0.0 --port 8002 --reload")
+    print("1. Backend: python -m uvicorn mcp_server.main:app --host 0.0.0.0 --port 8002 --reload --ws websockets --ws-per-message-deflate true")
     print("2. Frontend: cd ui && npm start")
     print("\nThen visit:")
     print("- Streaming Agent: http://localhost:3000")
@@ -5,10 +5,16 @@ Test script for WebSocket streaming functionality
 
 import asyncio
 import websockets
-import json
+import orjson
 import uuid
+import msgpack
 from datetime import datetime
 
+async def _drain(websocket, queue: asyncio.Queue):
+    """Decode every incoming frame onto the queue until the connection closes"""
+    async for raw in websocket:
+        queue.put_nowait(msgpack.unpackb(raw, raw=False))
+
 async def test_websocket_connection():
     """Test basic WebSocket connection and message exchange"""
     session_id = str(uuid.uuid4())
@@ -23,7 +29,7 @@ async def test_websocket_connection():
             
             # Wait for welcome message
             welcome_message = await websocket.recv()
-            welcome_data = json.loads(welcome_message)
+            welcome_data = msgpack.unpackb(welcome_message, raw=False)
             print(f"📨 Welcome message: {welcome_data['content']}")
             
             # Test messages to send
@@ -35,45 +41,44 @@ async def test_websocket_connection():
                 "Help me with a workflow for data analysis"
             ]
             
-            for i, message in enumerate(test_messages, 1):
-                print(f"\n📤 Sending test message {i}: {message}")
-                
-                # Send message
-                await websocket.send(json.dumps({
+            # Receive in the background while all messages are sent up front
+            queue: asyncio.Queue = asyncio.Queue()
+            recv_task = asyncio.create_task(_drain(websocket, queue))
+            
+            await asyncio.gather(*(
+                websocket.send(orjson.dumps({
                     "type": "user_message",
                     "content": message,
                     "session_id": session_id,
                     "timestamp": datetime.now().isoformat()
-                }))
-                
-                # Receive responses
-                response_count = 0
-                timeout_count = 0
-                max_timeout = 5  # Maximum timeouts before moving to next message
-                
-                while response_count < 10 and timeout_count < max_timeout:  # Expect multiple responses
-                    try:
-                        response = await asyncio.wait_for(websocket.recv(), timeout=3.0)
-                        response_data = json.loads(response)
-                        response_count += 1
-                        
-                        print(f"📥 Response {response_count} ({response_data['type']}): {response_data['content'][:100]}...")
-                        
-                        # Break if we get a completion message
-                        if response_data['type'] == 'agent_processing_complete':
-                            break
-                            
-                    except asyncio.TimeoutError:
-                        timeout_count += 1
-                        print(f"⏰ Timeout {timeout_count}/{max_timeout} waiting for response")
-                        
-                        if timeout_count >= max_timeout:
-                            print("⏭️  Moving to next test message due to timeout")
-                            break
-                
-                # Wait a bit before next message
-                await asyncio.sleep(2)
+                }).decode())
+                for message in test_messages
+            ))
+            for i, message in enumerate(test_messages, 1):
+                print(f"📤 Sent test message {i}: {message}")
+            print()
             
+            # Each message ends with an agent_processing_complete (or error) frame
+            response_count = 0
+            completed = 0
+            try:
+                while completed < len(test_messages):
+                    response_data = await asyncio.wait_for(queue.get(), timeout=30.0)
+                    response_count += 1
+                    
+                    # Agent steps arrive batched in a single agent_batch frame
+                    for item in response_data.get('steps', [response_data]):
+                        print(f"📥 Response {response_count} ({item['type']}): {item['content'][:100]}...")
+                    
+                    if response_data['type'] in ('agent_processing_complete', 'error'):
+                        completed += 1
+            except asyncio.TimeoutError:
+                print(f"⏰ Timed out with {completed}/{len(test_messages)} messages completed")
+            finally:
+                recv_task.cancel()
+            
+            if completed < len(test_messages):
+                return False
             print("\n✅ All test messages sent successfully!")
             
     except websockets.exceptions.ConnectionRefused:
@@ -92,9 +97,10 @@ async def test_rest_endpoints():
     print("\n🌐 Testing REST endpoints...")
     
     try:
-        async with httpx.AsyncClient() as client:
+        # One pooled client for every request below, so they share a keep-alive connection
+        async with httpx.AsyncClient(base_url="http://localhost:8002/api/v1") as client:
             # Test getting active sessions
-            response = await client.get("http://localhost:8002/api/v1/streaming/sessions")
+            response = await client.get("/streaming/sessions")
             
             if response.status_code == 200:
                 sessions = response.json()
@@ -103,6 +109,15 @@ async def test_rest_endpoints():
                     print(f"   📋 Session {session['session_id'][:8]}... - Status: {session['status']}")
             else:
                 print(f"❌ Failed to get sessions: {response.status_code}")
+                sessions = []
+            
+            # Test getting a single session's info
+            if sessions:
+                response = await client.get(f"/streaming/sessions/{sessions[0]['session_id']}")
+                if response.status_code == 200:
+                    print(f"✅ Session info: {response.json()['message_count']} messages")
+                else:
+                    print(f"❌ Failed to get session info: {response.status_code}")
                 
     except Exception as e:
         print(f"❌ Error testing REST endpoints: {e}")
@@ -114,7 +129,7 @@ def main():
     print("🧪 MCP-A2A WebSocket Streaming Test")
     print("=" * 40)
     print("Make sure the server is running with:")
-    print("python -m uvicorn mcp_server.main:app --host 0.0.0.0 --port 8002 --reload")
+    print("python -m uvicorn mcp_server.main:app --host 0.0.0.0 --port 8002 --reload --ws websockets --ws-per-message-deflate true")
     print("=" * 40)
     
     try:
@@ -0,0 +1,44 @@
+import asyncio
+
+import orjson
+
+from mcp_server.streaming import ConnectionManager, ConnectionRecord, token_prefix
+
+
+def test_full_send_queue_merges_tokens_without_losing_text():
+    session_id = "session-1"
+    tokens = [f"tok{i} " for i in range(50)]
+
+    async def run():
+        manager = ConnectionManager()
+        record = ConnectionRecord(
+            ws=None,
+            fmt="json",
+            token_prefix=token_prefix(session_id, "json"),
+            send_queue=asyncio.Queue(maxsize=4),
+        )
+        # A writer that never drains, so the queue fills up
+        record.writer = asyncio.create_task(asyncio.sleep(3600))
+        manager._shard(session_id)["records"][session_id] = record
+        try:
+            for i, token in enumerate(tokens):
+                assert await manager.send_token(token, session_id)
+                if i == 20:
+                    await manager.send_personal_message({"type": "status", "status": "halfway"}, session_id)
+            frames = []
+            while not record.send_queue.empty():
+                _, payload, _ = record.send_queue.get_nowait()
+                frames.append(orjson.loads(payload))
+            return frames
+        finally:
+            record.writer.cancel()
+
+    frames = asyncio.run(run())
+
+    assert len(frames) <= 4
+    assert [frame["type"] for frame in frames].count("status") == 1
+    status_at = next(i for i, frame in enumerate(frames) if frame["type"] == "status")
+    before = "".join(frame["content"] for frame in frames[:status_at])
+    after = "".join(frame["content"] for frame in frames[status_at + 1:])
+    assert before == "".join(tokens[:21])
+    assert after == "".join(tokens[21:])
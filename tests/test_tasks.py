@@ -0,0 +1,59 @@
+import asyncio
+
+import httpx
+import orjson
+import pytest
+
+from a2a_agent import tasks
+
+
+class FakeRedis:
+    """Just enough of the Redis client for the passthrough handlers and process_task_async."""
+
+    def __init__(self):
+        self.store = {}
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def setex(self, key, ttl, value):
+        self.store[key] = value
+
+    async def srem(self, key, member):
+        pass
+
+
+MCP_RESPONSES = {
+    tasks.FILES_SEARCH_PATH: ["/tmp/a.pdf", "/tmp/b.pdf"],
+    tasks.WEATHER_FORECAST_PATH: {"periods": [{"name": "Tonight", "temperature": 55}]},
+}
+
+
+def _mcp_handler(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, content=orjson.dumps(MCP_RESPONSES[request.url.path]), headers={"content-type": "application/json"})
+
+
+@pytest.mark.parametrize("data, path", [
+    ({"action": "file_search", "directory": "/tmp", "pattern": ".pdf"}, tasks.FILES_SEARCH_PATH),
+    ({"action": "weather_forecast", "lat": 37.77, "lon": -122.41}, tasks.WEATHER_FORECAST_PATH),
+])
+def test_async_passthrough_actions_complete(monkeypatch, data, path):
+    saved = []
+
+    async def fake_save_task(task_id, **fields):
+        saved.append(fields)
+
+    monkeypatch.setattr(tasks, "save_task", fake_save_task)
+    monkeypatch.setattr(tasks, "_redis", FakeRedis())
+
+    async def run():
+        client = httpx.AsyncClient(base_url=tasks.MCP_BASE, transport=httpx.MockTransport(_mcp_handler))
+        monkeypatch.setattr(tasks, "_client", client)
+        try:
+            await tasks.process_task_async("task-1", data)
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
+
+    assert saved[-1] == {"status": "completed", "result": MCP_RESPONSES[path]}
@@ -229,9 +229,9 @@ function StreamingChat() {
 
   const connectWebSocket = () => {
     setConnectionStatus("connecting");
-    console.log("Attempting WebSocket connection to:", `${WS_BASE}/api/v1/ws/${sessionId}`);
+    console.log("Attempting WebSocket connection to:", `${WS_BASE}/api/v1/ws/${sessionId}?fmt=json`);
     
-    const websocket = new WebSocket(`${WS_BASE}/api/v1/ws/${sessionId}`);
+    const websocket = new WebSocket(`${WS_BASE}/api/v1/ws/${sessionId}?fmt=json`);
     
     websocket.onopen = () => {
       console.log("WebSocket connected successfully");
@@ -244,17 +244,19 @@ function StreamingChat() {
         const message = JSON.parse(event.data);
         console.log("Received message:", message);
         
-        const newMessage = {
+        // Agent steps arrive batched in a single agent_batch frame
+        const incoming = message.type === "agent_batch" ? message.steps : [message];
+        const newMessages = incoming.map(item => ({
           id: Date.now() + Math.random(),
-          type: message.type,
-          content: message.content,
-          timestamp: message.timestamp || new Date().toISOString(),
-          stepInfo: message.step_info,
-          agentType: message.agent_type,
+          type: item.type,
+          content: item.content,
+          timestamp: item.timestamp || new Date().toISOString(),
+          stepInfo: item.step_info,
+          agentType: item.agent_type,
           sender: "agent",
-        };
+        }));
         
-        setMessages(prev => [...prev, newMessage]);
+        setMessages(prev => [...prev, ...newMessages]);
       } catch (error) {
         console.error("Error parsing message:", error);
       }
@@ -268,7 +270,7 @@ function StreamingChat() {
     
     websocket.onerror = (error) => {
       console.error("WebSocket error:", error);
-      console.error("WebSocket URL:", `${WS_BASE}/api/v1/ws/${sessionId}`);
+      console.error("WebSocket URL:", `${WS_BASE}/api/v1/ws/${sessionId}?fmt=json`);
       setConnectionStatus("disconnected");
     };
   };